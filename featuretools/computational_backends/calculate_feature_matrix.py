@@ -102,8 +102,7 @@ def calculate_feature_matrix(features, cutoff_time=None, instance_ids=None,
             cutoff_time = datetime.now()
 
         if instance_ids is None:
-            index_var = target_entity.index
-            instance_ids = target_entity.df[index_var].tolist()
+            instance_ids = target_entity.get_all_instances().tolist()
 
         if not isinstance(cutoff_time, list):
             cutoff_time = [cutoff_time] * len(instance_ids)
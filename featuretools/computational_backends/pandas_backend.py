@@ -6,10 +6,12 @@ import pstats
 import sys
 import uuid
 import warnings
+from collections import defaultdict
 from datetime import datetime
 
 import numpy as np
 import pandas as pd
+from pandas.api.types import is_categorical_dtype
 
 # featuretools
 from .base_backend import ComputationalBackend
@@ -17,13 +19,16 @@ from .feature_tree import FeatureTree
 
 from featuretools import variable_types
 from featuretools.entityset.relationship import Relationship
+from featuretools.entityset.variable_index import get_key_positions
 from featuretools.exceptions import UnknownFeature
 from featuretools.primitives import (
     AggregationPrimitive,
     DirectFeature,
     IdentityFeature,
+    PrimitiveBase,
     TransformPrimitive
 )
+from featuretools.primitives.transform_primitive import pd_calendar_units
 # progress bar
 from featuretools.utils.gen_utils import make_tqdm_iterator
 
@@ -43,6 +48,14 @@ class PandasBackend(ComputationalBackend):
         self.target_eid = features[0].entity.id
         self.features = features
         self.feature_tree = FeatureTree(entityset, features)
+        # values of cutoff independent transform features for every row of
+        # their entity, by entity id and feature name
+        self._transform_cache = {}
+        self._transformed_rows = {}
+        # names of transform features calculated along with the feature using
+        # them, rather than added to the frames
+        self._inlined = _get_inlined_features(self.feature_tree.all_features,
+                                              features)
 
     def calculate_all_features(self, instance_ids, time_last,
                                training_window=None, profile=False,
@@ -232,29 +245,80 @@ class PandasBackend(ComputationalBackend):
         assert entity_id in entity_frames
 
         frame = entity_frames[entity_id]
-        for f in features:
-            # handle when no data
-            if frame.shape[0] == 0:
+        features = [f for f in features if f.get_name() not in self._inlined]
+        # handle when no data
+        if frame.shape[0] == 0:
+            for f in features:
                 set_default_column(frame, f)
-                continue
+            return
 
-            # collect only the variables we need for this transformation
-            variable_data = [frame[bf.get_name()].values
-                             for bf in f.base_features]
+        # transforms which do not depend on the cutoff time are taken from
+        # their values for the whole entity, once they have been calculated
+        entity = self.entityset[entity_id]
+        cached = self._get_cached_transforms(entity, features, frame)
+        if len(cached):
+            positions = entity._get_row_index().get_indexer(frame.index)
+            for f in features:
+                if f.get_name() in cached:
+                    frame[f.get_name()] = cached[f.get_name()].take(positions)
+            features = [f for f in features if f.get_name() not in cached]
 
-            feature_func = f.get_function()
-            # apply the function to the relevant dataframe slice and add the
-            # feature row to the results dataframe.
-            if f.uses_calc_time:
-                values = feature_func(*variable_data, time=self.time_last)
-            else:
-                values = feature_func(*variable_data)
+        _apply_transforms(features, frame, self.time_last)
+        entity_frames[entity_id] = frame
 
-            if isinstance(values, pd.Series):
-                values = values.values
-            frame[f.get_name()] = list(values)
+    def _get_cached_transforms(self, entity, features, frame):
+        """
+        Get the values for every row of the entity of the features which do
+        not depend on the cutoff time. The values are only calculated once
+        the frames transformed for the entity add up to as many rows as it
+        has, so calculating a few instances does not transform every row.
 
-        entity_frames[entity_id] = frame
+        Returns:
+            dict[str -> np.ndarray] : values of the features, by name
+        """
+        independent = [f for f in features
+                       if _is_cutoff_independent(f, entity)]
+        if not len(independent):
+            return {}
+
+        cache = self._transform_cache.setdefault(entity.id, {})
+        missing = [f for f in independent if f.get_name() not in cache]
+        if len(missing):
+            rows = self._transformed_rows.get(entity.id, 0) + frame.shape[0]
+            self._transformed_rows[entity.id] = rows
+            if rows >= entity.num_instances:
+                self._cache_transforms(entity, missing)
+        return {f.get_name(): cache[f.get_name()] for f in independent
+                if f.get_name() in cache}
+
+    def _cache_transforms(self, entity, features):
+        """Calculate transform features for every row of the entity"""
+        cache = self._transform_cache[entity.id]
+        # the features and their transform dependencies, dependencies first
+        ordered = []
+        names = set(cache)
+        columns = set()
+
+        def add_feature(f):
+            if isinstance(f, IdentityFeature):
+                columns.add(f.get_name())
+                return
+            for bf in f.base_features:
+                add_feature(bf)
+            if f.get_name() not in names and f.get_name() not in self._inlined:
+                names.add(f.get_name())
+                ordered.append(f)
+
+        for f in features:
+            add_feature(f)
+
+        full_frame = entity.query_by_values(None, columns=list(columns),
+                                            copy=False)
+        for name, values in cache.items():
+            full_frame[name] = values
+        _apply_transforms(ordered, full_frame, None)
+        for f in ordered:
+            cache[f.get_name()] = full_frame[f.get_name()].values
 
     def _calculate_direct_features(self, features, entity_frames):
         entity_id = features[0].entity.id
@@ -291,9 +355,7 @@ class PandasBackend(ComputationalBackend):
         else:
             merge_df.set_index(merge_var, inplace=True)
 
-        new_df = pd.merge(left=child_df, right=merge_df,
-                          left_on=merge_var, right_index=True,
-                          how='left')
+        new_df = join_on_index(child_df, child_df[merge_var].values, merge_df)
 
         entity_frames[entity_id] = new_df
 
@@ -350,24 +412,10 @@ class PandasBackend(ComputationalBackend):
                 # This occured sometimes. I think it might have to do with category
                 # but not sure. TODO: look into when this occurs
                 no_instances = True
-            # if the foreign key column in the child (base_frame) that links to
-            # frame is an integer and the id column in the parent is an object or
-            # category dtype, the .isin() call errors.
-            elif (frame[index_var].dtype != base_frame[groupby_var].dtype or
-                    frame[index_var].dtype.name.find('category') > -1):
-                try:
-                    frame_as_obj = frame[index_var].astype(object)
-                    base_frame_as_obj = base_frame[groupby_var].astype(object)
-                except ValueError:
-                    msg = u"Could not join {}.{} (dtype={}) with {}.{} (dtype={})"
-                    raise ValueError(msg.format(entity.id, index_var,
-                                                frame[index_var].dtype,
-                                                child_entity.id, groupby_var,
-                                                base_frame[groupby_var].dtype))
-                else:
-                    no_instances = check_no_related_instances(frame_as_obj.values, base_frame_as_obj.values)
             else:
-                no_instances = check_no_related_instances(frame[index_var].values, base_frame[groupby_var].values)
+                positions = get_key_positions(frame[index_var].values,
+                                              base_frame[groupby_var].values)
+                no_instances = not (positions >= 0).any()
 
         if base_frame.empty or no_instances:
             for f in features:
@@ -384,9 +432,14 @@ class PandasBackend(ComputationalBackend):
         to_agg = {}
         agg_rename = {}
         to_apply = set()
+        to_group = []
         # apply multivariable and time-dependent features as we find them, and
         # save aggregable features for later
         for f in features:
+            if f.get_grouped_function() is not None:
+                to_group.append(f)
+                continue
+
             if _can_agg(f):
                 variable_id = f.base_features[0].get_name()
                 if variable_id not in to_agg:
@@ -403,31 +456,42 @@ class PandasBackend(ComputationalBackend):
 
             to_apply.add(f)
 
+        base_frame, group_keys, categories = get_group_keys(base_frame,
+                                                            groupby_var)
+
+        # Features with a grouped function calculate all groups in one call
+        if len(to_group):
+            to_merge = {}
+            for f in to_group:
+                func = f.get_grouped_function()
+                args = [base_frame[bf.get_name()] for bf in f.base_features]
+                if f.uses_calc_time:
+                    values = func(group_keys, *args, time=self.time_last)
+                else:
+                    values = func(group_keys, *args)
+                to_merge[f.get_name()] = values
+            to_merge = pd.DataFrame(to_merge)
+            if categories is not None:
+                to_merge.index = categories.take(to_merge.index)
+            frame = join_on_index(frame, frame[index_var].values, to_merge)
+
         # Apply the non-aggregable functions generate a new dataframe, and merge
         # it with the existing one
         if len(to_apply):
             wrap = agg_wrapper(to_apply, self.time_last)
-            # groupby_var can be both the name of the index and a column,
-            # to silence pandas warning about ambiguity we explicitly pass
-            # the column (in actuality grouping by both index and group would
-            # work)
-            to_merge = base_frame.groupby(base_frame[groupby_var]).apply(wrap)
+            to_merge = base_frame.groupby(group_keys).apply(wrap)
 
             to_merge.reset_index(1, drop=True, inplace=True)
-            frame = pd.merge(left=frame, right=to_merge,
-                             left_on=index_var, right_index=True, how='left')
+            if categories is not None:
+                to_merge.index = categories.take(to_merge.index)
+            frame = join_on_index(frame, frame[index_var].values, to_merge)
 
         # Apply the aggregate functions to generate a new dataframe, and merge
         # it with the existing one
         # Do the [variables] accessor on to_merge because the agg call returns
         # a dataframe with columns that contain the dataframes we want
         if len(to_agg):
-            # groupby_var can be both the name of the index and a column,
-            # to silence pandas warning about ambiguity we explicitly pass
-            # the column (in actuality grouping by both index and group would
-            # work)
-
-            to_merge = base_frame.groupby(base_frame[groupby_var]).agg(to_agg)
+            to_merge = base_frame.groupby(group_keys).agg(to_agg)
             # we apply multiple functions to each column, creating
             # a multiindex as the column
             # rename the columns to a concatenation of the two indexes
@@ -437,8 +501,9 @@ class PandasBackend(ComputationalBackend):
             to_merge = to_merge.rename(columns=agg_rename)
             variables = agg_rename.values()
             to_merge = to_merge[variables]
-            frame = pd.merge(left=frame, right=to_merge,
-                             left_on=index_var, right_index=True, how='left')
+            if categories is not None:
+                to_merge.index = categories.take(to_merge.index)
+            frame = join_on_index(frame, frame[index_var].values, to_merge)
 
         # Handle default values
         # 1. handle non scalar default values
@@ -464,6 +529,168 @@ class PandasBackend(ComputationalBackend):
         entity_frames[entity.id] = frame
 
 
+def _apply_transforms(features, frame, time_last):
+    """Calculate transform features of the rows of frame, adding them to it"""
+    # decode each datetime column once, for all of the calendar units used
+    # by features of it
+    calendar_units = {}
+    for f in features:
+        if f.calendar_unit is not None:
+            column = f.base_features[0].get_name()
+            calendar_units.setdefault(column, set()).add(f.calendar_unit)
+    calendar_values = {}
+
+    for f in features:
+        if f.calendar_unit is not None:
+            column = f.base_features[0].get_name()
+            if column not in calendar_values:
+                calendar_values[column] = pd_calendar_units(
+                    frame[column].values, calendar_units[column])
+            feature_func = f.get_calendar_function()
+            values = feature_func(calendar_values[column][f.calendar_unit])
+            frame[f.get_name()] = _as_column(values)
+            continue
+
+        if f.get_ufunc() is not None:
+            values = _apply_ufunc(f, frame)
+            if values is not None:
+                frame[f.get_name()] = _as_column(values)
+                continue
+
+        # base features which were to be calculated along with this one are
+        # added to the frame if its ufunc can not be used
+        missing = [bf for bf in f.base_features if bf.get_name() not in frame]
+        if len(missing):
+            _apply_transforms(missing, frame, time_last)
+
+        # collect only the variables we need for this transformation
+        variable_data = [frame[bf.get_name()].values
+                         for bf in f.base_features]
+
+        feature_func = f.get_function()
+        # apply the function to the relevant dataframe slice and add the
+        # feature row to the results dataframe.
+        if f.uses_calc_time:
+            values = feature_func(*variable_data, time=time_last)
+        else:
+            values = feature_func(*variable_data)
+
+        frame[f.get_name()] = _as_column(values)
+
+
+def _apply_ufunc(f, frame):
+    """
+    Calculate a transform feature with its ufunc. Base features which are not
+    columns of the frame are calculated with their own ufuncs in the same
+    pass, and each result is written over the array of one of these base
+    features when it has the right type. Returns None if a base feature is
+    not numeric, or is neither a column nor has a ufunc.
+    """
+    ufunc, operands = f.get_ufunc()
+    kinds = 'biuf' if ufunc in (np.logical_and, np.logical_or) else 'iuf'
+    values = []
+    buffers = []
+    for operand in operands:
+        if isinstance(operand, PrimitiveBase):
+            name = operand.get_name()
+            if name in frame:
+                operand = frame[name].values
+            elif isinstance(operand, TransformPrimitive) and \
+                    operand.get_ufunc() is not None:
+                operand = _apply_ufunc(operand, frame)
+                if operand is None:
+                    return None
+                buffers.append(operand)
+            else:
+                return None
+            if operand.dtype.kind not in kinds:
+                return None
+        values.append(operand)
+
+    # like pandas, integers modulo 0 are null
+    zeros = None
+    if ufunc is np.mod:
+        zeros = np.equal(values[1], 0)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # the type of the result, from arrays without any rows
+        dtype = ufunc(*[v[:0] if isinstance(v, np.ndarray) else v
+                        for v in values]).dtype
+        out = [b for b in buffers if b.dtype == dtype]
+        if len(out):
+            result = ufunc(*values, out=out[0])
+        else:
+            result = ufunc(*values)
+
+    if zeros is not None and result.dtype.kind in 'iu' and np.any(zeros):
+        result = result.astype(np.float64)
+        result[zeros] = np.nan
+    return result
+
+
+def _as_column(values):
+    """
+    Values of a transform feature to add to a frame. Arrays are added
+    without converting each value to a Python object, widened to 64 bits
+    like pandas does for a list of numbers. Arrays of objects are added as
+    lists so that pandas infers their type
+    """
+    if isinstance(values, pd.Series):
+        values = values.values
+    if not isinstance(values, np.ndarray) or values.dtype == object:
+        return list(values)
+    if values.dtype.kind in 'iu' and values.dtype.itemsize < 8:
+        return values.astype(np.int64)
+    if values.dtype.kind == 'f' and values.dtype.itemsize < 8:
+        return values.astype(np.float64)
+    return values
+
+
+def _get_inlined_features(all_features, requested):
+    """
+    Get the names of the transform features which are calculated with their
+    ufuncs in the same pass as the feature using them, so are not added to
+    the frames. These are not requested, and are used once, by a single
+    feature which has a ufunc too.
+    """
+    uses = defaultdict(list)
+    for f in all_features:
+        for dep in f.get_dependencies():
+            uses[dep.hash()].append(f)
+    requested = set(f.hash() for f in requested)
+
+    def has_ufunc(f):
+        return isinstance(f, TransformPrimitive) and f.get_ufunc() is not None
+
+    return set(f.get_name() for f in all_features
+               if has_ufunc(f) and f.hash() not in requested and
+               len(uses[f.hash()]) == 1 and has_ufunc(uses[f.hash()][0]))
+
+
+def _is_cutoff_independent(feature, entity):
+    """
+    Whether the values of a transform feature for a row of the entity are
+    the same at every cutoff time. The feature must be elementwise and not
+    use the cutoff time, and only depend on other such features or on
+    columns of the entity which are not masked by a secondary time index.
+    """
+    if isinstance(feature, IdentityFeature):
+        masked = set()
+        for time_index, columns in entity.secondary_time_index.items():
+            masked.add(time_index)
+            masked.update(columns)
+        return feature.entity.id == entity.id and \
+            feature.get_name() not in masked
+
+    return (isinstance(feature, TransformPrimitive) and
+            feature.elementwise and
+            not feature.uses_calc_time and
+            not feature.rolling_function and
+            not feature.expanding and
+            all(_is_cutoff_independent(bf, entity)
+                for bf in feature.base_features))
+
+
 def _can_agg(feature):
     assert isinstance(feature, AggregationPrimitive)
     base_features = feature.base_features
@@ -494,16 +721,44 @@ def agg_wrapper(feats, time_last):
     return wrap
 
 
-def check_no_related_instances(array1, array2):
-    some_instances = False
-    set_frame = set(array1)
-    set_base_frame = set(array2)
-    for s in set_frame:
-        for b in set_base_frame:
-            if s == b:
-                some_instances = True
-                break
-    return not some_instances
+def get_group_keys(base_frame, groupby_var):
+    """
+    Get the keys to group the rows of base_frame by the values of
+    groupby_var. Categorical variables are grouped by their integer codes, so
+    that only categories which occur form groups, and the codes are returned
+    with the categories to map them back to values. Rows with a null value do
+    not belong to any group, and are dropped.
+
+    Returns:
+        (pd.DataFrame, np.ndarray, pd.Index or None): the rows of base_frame
+            to group, their keys, and the categories of the keys
+    """
+    column = base_frame[groupby_var]
+    # groupby_var can be both the name of the index and a column, so the keys
+    # are passed as an array to avoid pandas warning about the ambiguity
+    if not is_categorical_dtype(column):
+        return base_frame, column.values, None
+
+    codes = column.cat.codes.values
+    has_value = codes >= 0
+    if not has_value.all():
+        base_frame = base_frame[has_value]
+        codes = codes[has_value]
+    return base_frame, codes, column.cat.categories
+
+
+def join_on_index(frame, key_values, to_join):
+    """
+    Left join the columns of to_join onto frame, matching key_values, one per
+    row of frame, against the index of to_join. Rows without a match get null
+    values. Returns a new dataframe, leaving frame unchanged.
+    """
+    positions = get_key_positions(to_join.index, key_values)
+    joined = to_join.reset_index(drop=True).reindex(positions)
+    new_frame = frame.copy(deep=False)
+    for c in joined.columns:
+        new_frame[c] = joined[c].values
+    return new_frame
 
 
 def set_default_column(frame, f):
@@ -129,8 +129,9 @@ class BaseEntitySet(FTBase):
         repr_out = u"Entityset: {}\n".format(fmat)
         repr_out += u"  Entities:"
         for e in self.entities[:5]:
-            if e.df.shape:
-                repr_out += u"\n    {} (shape = [{}, {}])".format(e.id, e.df.shape[0], e.df.shape[1])
+            shape = e.shape
+            if shape:
+                repr_out += u"\n    {} (shape = [{}, {}])".format(e.id, shape[0], shape[1])
             else:
                 repr_out += u"\n    {} (shape = [None, None])".format(e.id)
         if len(self.entities) > 5:
@@ -0,0 +1,186 @@
+import os
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import is_categorical_dtype
+
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+_METADATA_FILENAME = 'columns.p'
+
+
+class ColumnStore(object):
+    """Stores the columns of a dataframe in memory-mapped files
+
+    Each column is saved as a NumPy array in its own ``.npy`` file in a
+    directory. Numeric, boolean and datetime columns are saved as they are.
+    Other columns are saved as integer codes into their distinct values, like
+    a categorical, and the distinct values are kept with the metadata.
+
+    The files are opened as copy-on-write memory maps, so only the rows and
+    columns which are read get loaded, and the operating system's page cache
+    keeps recently used data in memory.
+    """
+
+    def __init__(self, path, columns=None):
+        """Open the columns saved in a directory by :meth:`.write`
+
+        Args:
+            path (str) : directory the columns were saved in
+            columns (list[str], optional) : only use these columns. Uses all
+                columns if None.
+        """
+        self.path = path
+        with open(os.path.join(path, _METADATA_FILENAME), 'rb') as f:
+            metadata = pickle.load(f)
+        self._positions = {column: i
+                           for i, column in enumerate(metadata['columns'])}
+        self.columns = metadata['columns']
+        if columns is not None:
+            self.columns = [c for c in self.columns if c in columns]
+        self.index = metadata['index']
+        self._num_rows = metadata['num_rows']
+        self._kinds = metadata['kinds']
+        self._values = metadata['values']
+        self._arrays = {}
+        self._row_index = None
+
+    @classmethod
+    def write(cls, df, path, index):
+        """Save the columns of a dataframe to a directory
+
+        Args:
+            df (pd.DataFrame) : dataframe to save
+            path (str) : directory to save it in. Created if it does not exist
+            index (str) : column used as the index of dataframes which are read
+
+        Returns:
+            :class:`.ColumnStore`
+        """
+        if not os.path.exists(path):
+            os.makedirs(path)
+
+        kinds = {}
+        values = {}
+        for i, column in enumerate(df.columns):
+            series = df[column]
+            if is_categorical_dtype(series):
+                kinds[column] = 'categorical'
+                values[column] = (series.cat.categories, series.cat.ordered)
+                array = series.cat.codes.values
+            elif isinstance(series.dtype, np.dtype) and \
+                    series.dtype.kind in 'biufmM':
+                kinds[column] = 'array'
+                array = series.values
+            else:
+                kinds[column] = 'object'
+                array, values[column] = pd.factorize(series.values)
+            np.save(_column_filename(path, i), array)
+
+        metadata = {'columns': list(df.columns),
+                    'index': index,
+                    'num_rows': len(df),
+                    'kinds': kinds,
+                    'values': values}
+        with open(os.path.join(path, _METADATA_FILENAME), 'wb') as f:
+            pickle.dump(metadata, f, protocol=pickle.HIGHEST_PROTOCOL)
+        return cls(path)
+
+    def __len__(self):
+        return self._num_rows
+
+    def _get_array(self, column):
+        if column not in self._arrays:
+            i = self._positions[column]
+            self._arrays[column] = np.load(_column_filename(self.path, i),
+                                           mmap_mode='c')
+        return self._arrays[column]
+
+    def get_values(self, column):
+        """Get the values of a column without loading them into memory
+
+        Columns which are not stored as they are come back as a
+        pd.Categorical over the memory-mapped codes.
+        """
+        array = self._get_array(column)
+        kind = self._kinds[column]
+        if kind == 'array':
+            return array
+        if kind == 'categorical':
+            categories, ordered = self._values[column]
+        else:
+            categories, ordered = self._values[column], False
+        return pd.Categorical.from_codes(array, categories, ordered=ordered)
+
+    def get_dtype(self, column):
+        """Get the dtype of a column as it is read, without loading it"""
+        if self._kinds[column] == 'object':
+            return np.dtype(object)
+        return self.get_values(column).dtype
+
+    def get_index(self):
+        """Get the index column as a pd.Index, which is kept in memory"""
+        if self._row_index is None:
+            self._row_index = pd.Index(self.read_column(self.index),
+                                       name=self.index)
+        return self._row_index
+
+    def read_column(self, column, rows=None):
+        """Load the values of a column in the rows selected by rows
+
+        Args:
+            column (str) : column to read
+            rows (slice, np.ndarray, optional) : positions or slice of the
+                rows to read. Reads all rows if None.
+
+        Returns:
+            np.ndarray or pd.Categorical
+        """
+        array = self._get_array(column)
+        if rows is None:
+            codes = np.array(array)
+        elif isinstance(rows, slice):
+            codes = np.array(array[rows])
+        else:
+            codes = np.asarray(array.take(rows))
+
+        kind = self._kinds[column]
+        if kind == 'categorical':
+            categories, ordered = self._values[column]
+            return pd.Categorical.from_codes(codes, categories,
+                                             ordered=ordered)
+        elif kind == 'object':
+            # null values have a code of -1, which takes the appended null
+            uniques = np.append(np.asarray(self._values[column], dtype=object),
+                                np.nan)
+            return uniques.take(codes)
+        return codes
+
+    def read(self, columns=None, rows=None):
+        """Load a dataframe with the selected rows and columns
+
+        Args:
+            columns (list[str], optional) : columns to read. Reads all columns
+                if None.
+            rows (slice, np.ndarray, optional) : positions or slice of the
+                rows to read. Reads all rows if None.
+
+        Returns:
+            pd.DataFrame : dataframe indexed by the index column
+        """
+        if columns is None:
+            columns = self.columns
+        data = {column: self.read_column(column, rows) for column in columns}
+        index = self.get_index()
+        if rows is not None:
+            index = index[rows]
+        return pd.DataFrame(data, index=index, columns=columns)
+
+
+def _column_filename(path, i):
+    # column names are not necessarily valid file names, so columns are
+    # saved by position
+    return os.path.join(path, '{}.npy'.format(i))
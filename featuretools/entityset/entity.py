@@ -5,9 +5,12 @@ from datetime import datetime
 
 import numpy as np
 import pandas as pd
+from pandas.api.types import is_categorical_dtype
 
 from .base_entity import BaseEntity
+from .column_store import ColumnStore
 from .timedelta import Timedelta
+from .variable_index import VariableIndex
 
 from featuretools import variable_types as vtypes
 from featuretools.utils.wrangle import _check_timedelta
@@ -18,12 +21,23 @@ _numeric_types = vtypes.PandasTypes._pandas_numerics
 _categorical_types = [vtypes.PandasTypes._categorical]
 _datetime_types = vtypes.PandasTypes._pandas_datetimes
 
+# number of most common values of discrete variables to keep when computing
+# their statistics, as candidates for interesting values
+_NUM_VALUE_COUNTS = 25
+# statistics whose floating point result depends on the memory layout of the
+# values, which are computed one column at a time
+_ORDER_DEPENDENT_STATS = ['mean', 'std', 'sum']
+
 
 class Entity(BaseEntity):
     """
     Stores all actual data for an entity
     """
     indexed_by = None
+    time_index_is_sorted = False
+    column_store = None
+    _df = None
+    _value_counts = None
 
     def __init__(self, id, df, entityset, variable_types=None, name=None,
                  index=None, time_index=None, secondary_time_index=None,
@@ -100,14 +114,60 @@ class Entity(BaseEntity):
 
     def normalize(self, normalizer):
         d = {k: v for k, v in self.__dict__.iteritems()
-             if k not in ['df', 'indexed_by', 'entityset']}
+             if k not in ['_df', 'column_store', 'indexed_by', 'entityset',
+                          '_value_counts']}
         return normalizer(d)
 
+    @property
+    def df(self):
+        """The data of the entity. If the entity is stored in a
+        :class:`.ColumnStore`, accessing it loads every column of the entity
+        back into memory, where it stays. Queries, statistics and saving the
+        entityset read stored entities without loading them.
+        """
+        if self.column_store is not None:
+            logger.warning(u"Loading entity %s stored in %s into memory",
+                           self.id, self.column_store.path)
+            self.load_columns()
+        return self._df
+
+    @df.setter
+    def df(self, df):
+        self._df = df
+        self.column_store = None
+        # values counted in the previous data no longer apply
+        self._value_counts = None
+
+    def store_columns(self, path):
+        """Move the data of the entity out of memory, into memory-mapped
+        files in a directory.
+
+        Queries only load the rows and columns they need, so entities larger
+        than memory can be used to calculate features. Indexes and variable
+        statistics are kept.
+
+        Args:
+            path (str) : directory to store the columns in
+        """
+        self.column_store = ColumnStore.write(self.df, path, self.index)
+        self._df = None
+
+    def load_columns(self):
+        """Load the data of an entity stored with :meth:`.store_columns` back
+        into memory."""
+        if self.column_store is not None:
+            self._df = self.column_store.read()
+            self.column_store = None
+
     @property
     def num_instances(self):
+        if self.column_store is not None:
+            return len(self.column_store)
         return self.df.shape[0]
 
     def get_shape(self):
+        if self.column_store is not None:
+            return (len(self.column_store), len(self.column_store.columns))
         return self.df.shape
 
     def is_index_column(self, varname):
@@ -132,6 +192,8 @@ class Entity(BaseEntity):
         """
 
         if cutoff_time is None:
+            if self.column_store is not None:
+                return self.column_store.read(rows=slice(0, n))
             valid_data = self.df
 
         elif isinstance(cutoff_time, pd.Timestamp) or \
@@ -156,13 +218,76 @@ class Entity(BaseEntity):
 
     def get_column_type(self, column_id):
         """ get type of column in underlying data structure """
-        return self.df[column_id].dtype.name
+        return self._get_column_dtype(column_id).name
+
+    def add_all_variable_statistics(self):
+        """Compute the statistics of every variable together. See
+        :meth:`._add_statistics`."""
+        self._add_statistics(self.variables)
+
+    def add_variable_statistics(self, var_id):
+        self._add_statistics([self._get_variable(var_id)])
+
+    def _add_statistics(self, variables, df=None):
+        """
+        Compute the statistics of variables in one pass over their columns,
+        in df if it is given or else in the entity's data.
+
+        Columns with the same dtype which need the same statistic are reduced
+        together, as one block, unless the statistic depends on the order in
+        which floating point values are added up. Discrete columns have their
+        values counted once, which gives their number of unique values and
+        the candidates for their interesting values.
+        """
+        if df is None:
+            df = self.df
+        self._value_counts = self._value_counts or {}
+        to_reduce = {}
+        values = {}
+        for variable in variables:
+            if variable.id not in df.columns:
+                raise AttributeError(u"%s not in entity" % (variable.id))
+            dtype = df[variable.id].dtype
+            for stat in variable._setter_stats:
+                if stat == 'nunique':
+                    counts = _count_values(df[variable.id],
+                                           _NUM_VALUE_COUNTS)
+                    self._value_counts[variable.id] = counts
+                    values[(variable.id, stat)] = counts[1]
+                elif stat in _ORDER_DEPENDENT_STATS and dtype.kind in 'fmO':
+                    to_reduce[(stat, variable.id)] = variable.id
+                else:
+                    to_reduce.setdefault((stat, dtype), []).append(variable.id)
+
+        for (stat, _), columns in to_reduce.items():
+            try:
+                result = getattr(df[columns], stat)()
+            except TypeError as e:
+                # the statistic is left unset, as for values it does not
+                # apply to
+                logger.warning(u"Could not calculate %s of %s in entity %s: %s",
+                               stat, columns, self.id, e)
+                continue
+            if not isinstance(columns, list):
+                values[(columns, stat)] = result
+                continue
+            for column in columns:
+                if column in result.index:
+                    values[(column, stat)] = result[column]
+
+        for variable in variables:
+            for stat in variable._setter_stats:
+                if (variable.id, stat) in values:
+                    setattr(variable, stat, values[(variable.id, stat)])
+            # computed statistics are derived from the setter statistics
+            for stat in variable._computed_stats:
+                setattr(variable, stat, None)
 
     def get_column_stat(self, column_id, stat):
         """ maximum value """
-        if column_id not in self.df.columns:
+        if column_id not in self._get_column_names():
             raise AttributeError(u"%s not in entity" % (column_id))
-        s = getattr(self.df[column_id], stat)()
+        s = getattr(self.get_column_data(column_id), stat)()
         return s
 
     def get_column_max(self, column_id):
@@ -214,12 +339,16 @@ class Entity(BaseEntity):
 
     def get_column_data(self, column_id):
         """ get data from column in specified form """
+        if self.column_store is not None:
+            return pd.Series(self.column_store.read_column(column_id),
+                             index=self.column_store.get_index(),
+                             name=column_id)
         return self.df[column_id]
 
     def query_by_values(self, instance_vals, variable_id=None, columns=None,
                         time_last=None, training_window=None,
                         return_sorted=False, start=None, end=None,
-                        random_seed=None, shuffle=False):
+                        random_seed=None, shuffle=False, copy=True):
         """Query instances that have variable with given value
 
         Args:
@@ -237,6 +366,9 @@ class Entity(BaseEntity):
             end (int) : If provided, only return instances before this index
             random_seed (int) : Provided to the shuffling procedure
             shuffle (bool) : If True, values will be shuffled before returning
+            copy (bool) : If False, the returned dataframe may share data with
+                the entity to avoid copying it. New columns can be added to
+                it, but existing values must not be modified in place.
 
         Returns:
             pd.DataFrame : instances that match constraints
@@ -249,54 +381,123 @@ class Entity(BaseEntity):
                     training_window.is_absolute()),\
                 "training window must be an absolute Timedelta"
 
+        # rows between these positions satisfy time_last and training_window
+        time_bounds = self._get_time_bounds(time_last, training_window)
+
         if instance_vals is None:
-            df = self.df
+            rows = None if time_bounds is None else slice(*time_bounds)
+
+        else:
+            if variable_id is None or variable_id == self.index:
+                positions = self._get_row_index().get_indexer(instance_vals.values)
+                positions = positions[positions >= 0]
 
-        elif variable_id is None or variable_id == self.index:
-            df = self.df.loc[instance_vals]
-            df.dropna(subset=[self.index], inplace=True)
+            elif variable_id in self.indexed_by:
+                # some variables are indexed ahead of time
+                index = self.get_variable_index(variable_id)
+                positions = index.get_positions(instance_vals.values)
 
-        elif variable_id in self.indexed_by:
-            # some variables are indexed ahead of time
-            index = self.indexed_by[variable_id]
+            else:
+                # filter by "row.variable_id IN instance_vals"
+                values = pd.Series(self._get_column_values(variable_id))
+                positions = np.flatnonzero(values.isin(instance_vals).values)
 
-            # generate pd.Series of all values from the index. Indexing
-            # is much faster on this type.
-            to_append = [pd.Series(index[v]) for v in instance_vals
-                         if v in index]
-            my_id_vals = pd.Series([]).append(to_append)
-            df = self.df.loc[my_id_vals]
+            if time_bounds is not None:
+                first, last = time_bounds
+                positions = positions[(positions >= first) & (positions < last)]
+            rows = positions
 
-        else:
-            # filter by "row.variable_id IN instance_vals"
-            mask = self.df[variable_id].isin(instance_vals)
-            df = self.df[mask]
+        df = self._get_rows(rows, columns, variable_id)
 
         sortby = variable_id if (return_sorted and not shuffle) else None
-        return self._filter_and_sort(df=df,
-                                     time_last=time_last,
-                                     training_window=training_window,
-                                     columns=columns,
-                                     sortby=sortby,
-                                     start=start,
-                                     end=end,
-                                     shuffle=shuffle,
-                                     random_seed=random_seed)
+        df = self._filter_and_sort(df=df,
+                                   time_last=time_last,
+                                   training_window=training_window,
+                                   filter_by_time=time_bounds is None,
+                                   columns=columns,
+                                   sortby=sortby,
+                                   start=start,
+                                   end=end,
+                                   shuffle=shuffle,
+                                   random_seed=random_seed)
+
+        # selecting rows by position already copies the data, only slices of
+        # the full dataframe still share it
+        if copy and instance_vals is None and self.column_store is None:
+            df = df.copy()
+        return df
+
+    def _get_rows(self, rows, columns=None, variable_id=None):
+        """
+        Get the rows of the entity at a slice or array of positions, or all
+        rows if rows is None. If the entity is in memory, all columns are
+        returned, and a full slice is a shallow copy, so that the entity's
+        dataframe is never changed by adding or replacing columns of the
+        result. If it is stored, only the rows and columns which are needed
+        to return columns and filter by time are loaded.
+        """
+        if self.column_store is None:
+            if rows is None:
+                return self.df.copy(deep=False)
+            return self.df.iloc[rows]
+
+        if columns is not None:
+            needed = [self.index, self.time_index, variable_id] + list(columns)
+            for time_index, associated in self.secondary_time_index.items():
+                needed += [time_index] + list(associated)
+            columns = [c for c in self.column_store.columns if c in needed]
+        return self.column_store.read(columns, rows)
+
+    def _take_columns(self, columns, rows):
+        """
+        Get some columns at an array of row positions, as a dataframe with a
+        default integer index. Other columns are not copied or loaded.
+        """
+        if self.column_store is not None:
+            data = {c: self.column_store.read_column(c, rows) for c in columns}
+        else:
+            data = {c: self.df[c].iloc[rows].values for c in columns}
+        return pd.DataFrame(data, columns=columns)
+
+    def _get_row_index(self):
+        """Get the index of the entity's rows, which maps ids to positions"""
+        if self.column_store is not None:
+            return self.column_store.get_index()
+        return self.df.index
+
+    def _get_column_names(self):
+        """Get the names of the entity's columns, without loading them"""
+        if self.column_store is not None:
+            return pd.Index(self.column_store.columns)
+        return self.df.columns
+
+    def _get_column_dtype(self, column_id):
+        """Get the dtype of a column, without loading it"""
+        if self.column_store is not None:
+            return self.column_store.get_dtype(column_id)
+        return self.df[column_id].dtype
+
+    def _get_column_values(self, variable_id):
+        """
+        Get the values of a column without copying them. Stored columns are
+        not loaded into memory.
+        """
+        if self.column_store is not None:
+            return self.column_store.get_values(variable_id)
+        return self.df[variable_id].values
 
     def index_by_parent(self, parent_entity):
         """
-        Cache the instances of this entity grouped by the parent entity.
+        Register this entity to be indexed by the parent entity. The index is
+        built the first time it is needed.
         """
         r = parent_entity.entityset.get_relationship(self.id,
                                                      parent_entity.id)
         relation_var_id = r.child_variable.id
-        if relation_var_id not in self.indexed_by:
-            self.indexed_by[relation_var_id] = {}
-        else:
-            if self._verbose:
-                print 'Re-indexing %s by %s' % (self.id, parent_entity.id)
+        if self.indexed_by.get(relation_var_id) is not None and self._verbose:
+            print 'Re-indexing %s by %s' % (self.id, parent_entity.id)
 
-        self.index_by_variable(relation_var_id)
+        self.indexed_by[relation_var_id] = None
 
     def index_by_variable(self, variable_id):
         """
@@ -304,28 +505,55 @@ class Entity(BaseEntity):
         This allows filtering to happen much more quickly later.
         """
         ts = time.time()
-        gb = self.df.groupby(self.df[variable_id])
-        index = self.indexed_by[variable_id]
+        index = VariableIndex.from_values(self._get_column_values(variable_id))
+        self.indexed_by[variable_id] = index
 
         if self._verbose:
             print "Indexing '%s' in %d groups by variable '%s'" %\
-                (self.id, len(gb.groups), variable_id)
+                (self.id, len(index), variable_id)
+            print "...%d child instances took %.2f seconds" %\
+                (self.num_instances, time.time() - ts)
+        return index
 
-        # index by each parent instance separately
-        for i in gb.groups:
-            index[i] = np.array(gb.groups[i])
+    def get_variable_index(self, variable_id):
+        """
+        Get the index of a registered variable, building it if it has not
+        been built yet.
+        """
+        index = self.indexed_by[variable_id]
+        if index is None:
+            index = self.index_by_variable(variable_id)
+        return index
 
-        if self._verbose:
-            print "...%d child instances took %.2f seconds" %\
-                (len(self.df.index), time.time() - ts)
+    def build_indexes(self):
+        """
+        Build every registered index which has not been built yet.
+        """
+        for variable_id in self.get_unbuilt_indexes():
+            self.index_by_variable(variable_id)
+
+    def get_unbuilt_indexes(self):
+        return [variable_id for variable_id, index in self.indexed_by.items()
+                if index is None]
+
+    def reset_indexes(self):
+        """
+        Mark all indexes to be rebuilt the next time they are needed.
+        """
+        for variable_id in self.indexed_by:
+            self.indexed_by[variable_id] = None
 
-    def infer_variable_types(self, ignore=None, link_vars=None):
+    def infer_variable_types(self, ignore=None, link_vars=None,
+                             sample_size=10000):
         """Extracts the variables from a dataframe
 
         Args:
             ignore (list[str]): Names of variables (columns) for which to skip
                 inference
             link_vars (list[str]): Name of linked variables to other entities
+            sample_size (int): Number of rows to evaluate the heuristics
+                which distinguish types on. The rows are evenly spaced, and
+                taken once for all columns.
         Returns:
             list[:class:`.Variable`]: A list of variables describing the
                 contents of the dataframe
@@ -335,6 +563,9 @@ class Entity(BaseEntity):
         link_vars = link_vars or []
         inferred_types = {}
         df = self.df
+        rows = df
+        if len(df) > sample_size:
+            rows = df.iloc[np.linspace(0, len(df) - 1, sample_size).astype(int)]
         vids_to_assume_datetime = [self.time_index]
         if len(self.secondary_time_index.keys()):
             vids_to_assume_datetime.append(self.secondary_time_index.keys()[0])
@@ -359,8 +590,7 @@ class Entity(BaseEntity):
                         inferred_type = vtypes.Datetime
                     else:
                         # heuristics to predict this some other than categorical
-                        sample = df[variable].sample(min(10000, df[variable].nunique()))
-                        avg_length = sample.str.len().mean()
+                        avg_length = rows[variable].str.len().mean()
                         if avg_length > 50:
                             inferred_type = vtypes.Text
                         else:
@@ -379,9 +609,7 @@ class Entity(BaseEntity):
                 inferred_type = vtypes.Ordinal
 
             elif len(df[variable]):
-                sample = df[variable] \
-                    .sample(min(10000, df[variable].nunique(dropna=False)))
-
+                sample = rows[variable]
                 unique = sample.unique()
                 percent_unique = sample.size / float(len(unique))
 
@@ -394,22 +622,254 @@ class Entity(BaseEntity):
 
         return inferred_types
 
-    def update_data(self, df):
+    def update_data(self, df, num_unchanged_rows=0):
+        """
+        Replace the data of the entity.
+
+        Args:
+            df (pd.DataFrame) : new data for the entity
+            num_unchanged_rows (int) : number of rows at the start of df which
+                are the rows of the current data, unchanged and in the same
+                order. Indexes are extended with the remaining rows rather
+                than rebuilt.
+        """
         self.df = df
+        for variable_id, index in self.indexed_by.items():
+            if index is not None and num_unchanged_rows > 0:
+                new_values = df[variable_id].values[num_unchanged_rows:]
+                index.extend(new_values, start=num_unchanged_rows)
+            else:
+                self.indexed_by[variable_id] = None
+        self.check_time_index_sorted()
         self.add_all_variable_statistics()
 
+    def append_rows(self, df):
+        """
+        Add rows to the entity, keeping its data in order and its indexes and
+        variable statistics up to date without rebuilding them.
+
+        The new rows are sorted and merged into the existing ones, so that
+        the entity stays sorted by its time index, or by its index if it has
+        no time index. If the existing rows are not in that order, the new
+        rows are added at the end. Statistics are combined with those of the
+        new rows, so floating point statistics may differ in their last
+        digits from statistics calculated over all rows at once.
+
+        Args:
+            df (pd.DataFrame) : rows to add, with a column for every variable
+                of the entity. The values of the index cannot already be in
+                the entity.
+        """
+        old_df = self.df
+        for variable in self.variables:
+            if variable.id not in df.columns:
+                raise LookupError("Variable ID %s not in DataFrame" % (variable.id))
+        df = df[list(old_df.columns)]
+        df.index = pd.Index(df[self.index].values, name=self.index)
+        assert df.index.is_unique, "Index is not unique on dataframe (Entity {})".format(self.id)
+        assert not (old_df.index.get_indexer(df.index) >= 0).any(), \
+            "Index values already in entity (Entity {})".format(self.id)
+
+        for column in df.columns:
+            old_column = old_df[column]
+            if old_column.dtype.kind == 'M' and df[column].dtype.kind != 'M':
+                df[column] = pd.to_datetime(df[column])
+            elif is_categorical_dtype(old_column):
+                new_categories = pd.Index(df[column].dropna().unique())
+                new_categories = new_categories.difference(old_column.cat.categories)
+                if len(new_categories):
+                    old_column = old_column.cat.add_categories(new_categories)
+                    old_df[column] = old_column
+                df[column] = pd.Categorical(df[column],
+                                            categories=old_column.cat.categories,
+                                            ordered=old_column.cat.ordered)
+
+        if self.time_index is not None:
+            sort_by = [self.time_index, self.index]
+        else:
+            sort_by = [self.index]
+        df = df.sort_values(sort_by, kind="mergesort")
+        positions = self._get_insert_positions(df)
+
+        self._append_statistics(old_df, df)
+
+        num_rows = len(old_df)
+        if (positions == num_rows).all():
+            combined = pd.concat([old_df, df])
+            for variable_id, index in self.indexed_by.items():
+                if index is not None:
+                    index.extend(df[variable_id].values, start=num_rows)
+        else:
+            # rows inserted at the same position as an existing row go before it
+            new_positions = positions + np.arange(len(df))
+            old_positions = np.arange(num_rows)
+            old_positions += np.searchsorted(positions, old_positions, side='right')
+            order = np.empty(num_rows + len(df), dtype=np.int64)
+            order[old_positions] = np.arange(num_rows)
+            order[new_positions] = num_rows + np.arange(len(df))
+            combined = pd.concat([old_df, df]).iloc[order]
+            for variable_id, index in self.indexed_by.items():
+                if index is not None:
+                    index.insert(df[variable_id].values, new_positions,
+                                 old_positions)
+        # the value counts already include the new rows
+        value_counts = self._value_counts
+        self.df = combined
+        self._value_counts = value_counts
+        self.check_time_index_sorted()
+
+    def _get_insert_positions(self, df):
+        """
+        Find the position among the existing rows at which each of the sorted
+        rows of df goes, so that the entity stays sorted by its time index
+        and then its index. Rows go at the end if the entity is not sorted,
+        or if they have no time.
+        """
+        num_rows = self.num_instances
+        positions = np.full(len(df), num_rows, dtype=np.int64)
+        if self.time_index is not None:
+            if not self.time_index_is_sorted:
+                return positions
+            keys = self._get_column_values(self.time_index)
+            new_keys = df[self.time_index].values
+            if new_keys.dtype != keys.dtype:
+                return positions
+        else:
+            if not self._get_row_index().is_monotonic_increasing:
+                return positions
+            keys = self._get_row_index().values
+            new_keys = df.index.values
+
+        valid = np.flatnonzero(pd.notnull(new_keys))
+        starts = np.searchsorted(keys, new_keys[valid], side='left')
+        positions[valid] = starts
+        if self.time_index is None:
+            return positions
+
+        # rows with the same time as existing rows are ordered by index, so
+        # they go after the existing rows of that time with a smaller index
+        ends = np.searchsorted(keys, new_keys[valid], side='right')
+        tied = np.flatnonzero(ends > starts)
+        if not len(tied):
+            return positions
+        segment_starts, first, segments = np.unique(starts[tied],
+                                                    return_index=True,
+                                                    return_inverse=True)
+        lengths = ends[tied][first] - segment_starts
+        offsets = np.cumsum(lengths) - lengths
+        num_tied_rows = lengths.sum()
+        rows = np.arange(num_tied_rows) + \
+            np.repeat(segment_starts - offsets, lengths)
+
+        # the existing rows of each time and the new rows are sorted together
+        # by time and then index. The new rows are already in that order, so
+        # the i-th new row comes after i other new rows
+        n = len(tied)
+        order = np.lexsort((
+            np.repeat([0, 1], [num_tied_rows, n]),
+            np.concatenate([self._get_row_index().values[rows],
+                            df.index.values[valid[tied]]]),
+            np.concatenate([np.repeat(np.arange(len(lengths)), lengths),
+                            segments])))
+        ranks = np.empty(len(order), dtype=np.int64)
+        ranks[order] = np.arange(len(order))
+        num_before = ranks[num_tied_rows:] - np.arange(n)
+        positions[valid[tied]] = segment_starts[segments] + num_before - \
+            offsets[segments]
+        return positions
+
+    def _append_statistics(self, old_df, df):
+        """
+        Combine the statistics of each variable with those of the rows in df,
+        which are added to the rows in old_df. Statistics which cannot be
+        combined are calculated again over all rows.
+        """
+        self._value_counts = self._value_counts or {}
+        recalculate = []
+        for variable in self.variables:
+            column = df[variable.id]
+            kind = column.dtype.kind
+            old_count = variable._statistics.get('count')
+            new_count = column.count()
+            stats = {}
+            for stat in variable._setter_stats:
+                old = variable._statistics.get(stat)
+                if old is None or old_count is None:
+                    break
+                if stat == 'count':
+                    stats[stat] = old_count + new_count
+                elif stat == 'nunique':
+                    stats[stat] = self._append_value_counts(variable.id,
+                                                            old_df, column)
+                elif new_count == 0:
+                    stats[stat] = old
+                elif old_count == 0:
+                    stats[stat] = getattr(column, stat)()
+                elif stat == 'sum' and kind in 'biuf':
+                    stats[stat] = old + column.sum()
+                elif stat in ('max', 'min') and kind in 'biufM':
+                    new = getattr(column, stat)()
+                    stats[stat] = max(old, new) if stat == 'max' else min(old, new)
+                elif stat in ('mean', 'std') and kind in 'biuf':
+                    stats[stat] = _combine_moment(stat, variable, old_count,
+                                                  column, new_count)
+                else:
+                    break
+            else:
+                for stat, value in stats.items():
+                    setattr(variable, stat, value)
+                for stat in variable._computed_stats:
+                    setattr(variable, stat, None)
+                continue
+            recalculate.append(variable)
+
+        if recalculate:
+            columns = [v.id for v in recalculate]
+            self._add_statistics(recalculate,
+                                 df=pd.concat([old_df[columns], df[columns]]))
+
+    def _append_value_counts(self, variable_id, old_df, column):
+        """
+        Update the counted values of a variable with the values of added rows
+        and return its new number of unique values.
+        """
+        new_counts, num_new_values, _ = _count_values(column)
+        counts, num_values, total_count = \
+            self._value_counts.pop(variable_id, (None, None, 0))
+        if counts is not None and len(counts) == num_values:
+            # every value was kept, so the counts can be added up
+            counts = counts.add(new_counts, fill_value=0).astype(np.int64)
+            counts = counts.sort_values(ascending=False)
+            self._value_counts[variable_id] = \
+                (counts.iloc[:_NUM_VALUE_COUNTS], len(counts), np.sum(counts))
+            return len(counts)
+
+        # values of the new rows which are not among the existing values
+        index = self.indexed_by.get(variable_id)
+        if index is not None:
+            seen = index.keys
+        else:
+            old_column = old_df[variable_id]
+            seen = old_column[old_column.isin(new_counts.index)].unique()
+        unseen = ~pd.Index(new_counts.index).isin(seen)
+        return self._get_variable(variable_id).nunique + int(unseen.sum())
+
     def get_sample(self, n):
         df = self.df
         n = min(n, len(df))
         sampled = df.sample(n)
+        # the sample counts its own values, as they are first needed
+        value_counts = self._value_counts
         self.df = sampled
         indexed_by = self.indexed_by
-        self.indexed_by = {}
+        self.indexed_by = {variable_id: None for variable_id in indexed_by}
         copied = copy.copy(self)
         self.df = df
         self.indexed_by = indexed_by
+        self._value_counts = value_counts
         for variable in copied.variables:
             variable.entity = copied
+        copied.check_time_index_sorted()
         return copied
 
     def add_interesting_values(self, max_values=5, verbose=False):
@@ -437,18 +897,23 @@ class Entity(BaseEntity):
                 if skip:
                     continue
 
-                counts = self.df[variable.id].value_counts()
-
-                # find how many of each unique value there are; sort by count,
-                # and add interesting values to each variable
-                total_count = np.sum(counts)
-                counts[:] = counts.sort_values()[::-1]
-                for i in range(min(max_values, len(counts.index))):
+                # the values were counted with the statistics of the variable,
+                # unless more values are needed than were kept
+                counts, num_values, total_count = \
+                    (self._value_counts or {}).get(variable.id, (None, 0, 0))
+                if counts is None or \
+                        (len(counts) < max_values and len(counts) < num_values):
+                    counts, num_values, total_count = \
+                        _count_values(self.df[variable.id])
+
+                # find how many of each unique value there are, sorted by
+                # count, and add interesting values to each variable
+                for i in range(min(max_values, num_values)):
                     idx = counts.index[i]
 
                     # add the value to interesting_values if it represents more than
                     # 25% of the values we have not seen so far
-                    if len(counts.index) < 25:
+                    if num_values < 25:
                         if verbose:
                             msg = "Variable {}: Marking {} as an "
                             msg += "interesting value"
@@ -466,6 +931,45 @@ class Entity(BaseEntity):
                         else:
                             break
 
+    def optimize_memory(self, max_categorical_fraction=0.5):
+        """Store each column of the entity in the smallest dtype that holds
+            its values exactly
+
+        Integers are downcast to int32 or int16, floats to float32 if no
+        value changes, booleans stored as objects become bools, and discrete
+        object columns with few distinct values become categoricals. The
+        index and datetime columns are left alone.
+
+        Args:
+            max_categorical_fraction (float) : largest ratio of distinct
+                values to rows for which a discrete column is converted to a
+                categorical
+
+        Returns:
+            pd.DataFrame : dtype and memory usage in bytes of each column
+                before and after, indexed by variable id
+        """
+        report = []
+        for variable in self.variables:
+            column = self.df[variable.id]
+            compacted = column
+            if variable.id != self.index:
+                compacted = _compact_column(column, variable,
+                                            max_categorical_fraction)
+            if compacted is not column:
+                self.df[variable.id] = compacted
+            report.append({
+                'variable': variable.id,
+                'dtype_before': column.dtype.name,
+                'dtype_after': compacted.dtype.name,
+                'memory_before': column.memory_usage(index=False, deep=True),
+                'memory_after': compacted.memory_usage(index=False, deep=True),
+            })
+        report = pd.DataFrame(report, columns=['variable',
+                                               'dtype_before', 'dtype_after',
+                                               'memory_before', 'memory_after'])
+        return report.set_index('variable')
+
     def add_column(self, column_id, column_data, type=None):
         """
         Add variable to entity's dataframe
@@ -480,7 +984,7 @@ class Entity(BaseEntity):
         """
         Remove variable from entity's dataframe
         """
-        self.df.drop(column_id, axis=1, inplace=True)
+        del self.df[column_id]
         del self.variable_types[column_id]
 
     def entityset_convert_variable_type(self, column_id, new_type, **kwargs):
@@ -511,11 +1015,13 @@ class Entity(BaseEntity):
     def set_time_index(self, variable_id, already_sorted=False):
         if variable_id is not None:
             # use stable sort
-            if not already_sorted:
+            if not already_sorted and not self._is_sorted_by_time(variable_id):
                 # sort by time variable, then by index
                 self.df.sort_values([variable_id, self.index],
                                     kind="mergesort",
                                     inplace=True)
+                self._build_index(self.index)
+                self.reset_indexes()
 
             t = vtypes.TimeIndex
             if col_is_datetime(self.df[variable_id]):
@@ -523,13 +1029,67 @@ class Entity(BaseEntity):
             self.convert_variable_type(variable_id, t, convert_data=False)
         else:
             # todo add test for this
-            if not already_sorted:
+            if not already_sorted and not self.df.index.is_monotonic_increasing:
                 # sort by time variable, then by index
                 self.df.sort_values([self.index],
                                     kind="mergesort",
                                     inplace=True)
+                self._build_index(self.index)
+                self.reset_indexes()
 
         super(Entity, self).set_time_index(variable_id)
+        self.check_time_index_sorted()
+
+    def _is_sorted_by_time(self, variable_id):
+        """
+        Check whether the rows are already in the order sorting by the time
+        variable and then by the index would put them in, so that data which
+        arrives sorted is not reordered again. Returns False whenever the
+        order cannot be checked cheaply, e.g. with null or non-numeric times.
+        """
+        time_values = self._get_column_values(variable_id)
+        if len(time_values) < 2:
+            return True
+        if time_values.dtype.kind not in 'iufmM' or pd.isnull(time_values).any():
+            return False
+        index_values = self._get_row_index().values
+        if not isinstance(index_values, np.ndarray) or \
+                index_values.dtype.kind not in 'iufmMO' or \
+                pd.isnull(index_values).any():
+            return False
+        later = time_values[1:] > time_values[:-1]
+        if later.all():
+            return True
+        ties = time_values[1:] == time_values[:-1]
+        try:
+            ordered_ties = index_values[1:][ties] >= index_values[:-1][ties]
+        except TypeError:
+            return False
+        return bool((later | ties).all() and np.all(ordered_ties))
+
+    def _get_time_order(self, variable_id):
+        """
+        Get the positions of the rows in order of the time variable and then
+        of the index, or None if the rows already are in that order. Only
+        the two columns are sorted, not the whole dataframe.
+        """
+        if self._is_sorted_by_time(variable_id):
+            return None
+        keys = pd.DataFrame({'time': self._get_column_values(variable_id),
+                             'index': self._get_row_index().values})
+        return keys.sort_values(['time', 'index'], kind='mergesort').index.values
+
+    def check_time_index_sorted(self):
+        """
+        Record whether the data is sorted by the time index, in which case
+        rows can be filtered by time with a binary search.
+        """
+        self.time_index_is_sorted = False
+        if self.time_index is not None and self.num_instances:
+            time_values = self._get_time_values()
+            if time_values.dtype.kind in 'iufM':
+                self.time_index_is_sorted = \
+                    bool(np.all(time_values[1:] >= time_values[:-1]))
 
     def set_index(self, variable_id, unique=True):
         """
@@ -537,7 +1097,7 @@ class Entity(BaseEntity):
             variable_id (string) : name of an existing variable to set as index
             unique (bool) : whether to assert that the index is unique
         """
-        self.df = self.df.set_index(self.df[variable_id], drop=False)
+        self._build_index(variable_id)
         if unique:
             assert self.df.index.is_unique, "Index is not unique on dataframe (Entity {})".format(self.id)
 
@@ -545,6 +1105,55 @@ class Entity(BaseEntity):
 
         super(Entity, self).set_index(variable_id)
 
+    def _build_index(self, variable_id):
+        """
+        Set the index of the dataframe over the values of a column rather
+        than a copy of them, so the index variable is only stored once.
+        Sorting the dataframe copies its index, so it is built again after.
+        """
+        self.df.index = pd.Index(self.df[variable_id].values, name=variable_id)
+
+    def _get_time_bounds(self, time_last, training_window=None):
+        """
+        Use the sorted time index to find the positions of the first and
+        last rows of the entity which are within time_last and
+        training_window. Returns None if the time index cannot be searched,
+        in which case rows have to be filtered individually.
+        """
+        if (time_last is None or not self.time_index or
+                not self.time_index_is_sorted or not self.num_instances):
+            return None
+
+        time_values = self._get_column_values(self.time_index)
+        try:
+            pd.Series(time_values[:1]).iloc[0] <= time_last
+        except TypeError:
+            return None
+
+        is_datetime = time_values.dtype.kind == 'M'
+        time_values = self._get_time_values()
+
+        def search(t, side):
+            if is_datetime:
+                t = pd.Timestamp(t).value
+            return np.searchsorted(time_values, t, side=side)
+
+        first = 0
+        if training_window is not None:
+            first = search(time_last - training_window, 'left')
+        last = search(time_last, 'right')
+        return first, last
+
+    def _get_time_values(self):
+        """
+        Get the time index as a NumPy array without copying it. Datetimes are
+        viewed as int64 nanoseconds.
+        """
+        time_values = self._get_column_values(self.time_index)
+        if time_values.dtype.kind == 'M':
+            time_values = time_values.view(np.int64)
+        return time_values
+
     def _vals_to_series(self, instance_vals, variable_id):
         """
         instance_vals may be a pd.Dataframe, a pd.Series, a list, a single
@@ -561,17 +1170,20 @@ class Entity(BaseEntity):
         if type(instance_vals) == pd.DataFrame:
             out_vals = instance_vals[variable_id]
         elif type(instance_vals) == pd.Series:
-            out_vals = instance_vals.rename(variable_id)
+            out_vals = pd.Series(instance_vals.values, name=variable_id)
         else:
             out_vals = pd.Series(instance_vals, name=variable_id)
 
-        # we've had weird problem with pandas read-only errors
-        out_vals = copy.deepcopy(out_vals)
+        # pandas can't hash read-only arrays, so only those are copied
+        values = out_vals.values
+        if isinstance(values, np.ndarray) and not values.flags.writeable:
+            out_vals = out_vals.copy()
         # no duplicates or NaN values
-        return pd.Series(out_vals).drop_duplicates().dropna()
+        return out_vals.drop_duplicates().dropna()
 
     def _filter_and_sort(self, df, time_last=None,
                          training_window=None,
+                         filter_by_time=True,
                          columns=None, sortby=None,
                          start=None, end=None,
                          shuffle=False, random_seed=None):
@@ -580,7 +1192,7 @@ class Entity(BaseEntity):
         If this entity does not have a time index, return the original
         dataframe.
         """
-        if self.time_index:
+        if self.time_index and filter_by_time:
             if time_last is not None and not df.empty:
                 try:
                     df.iloc[0][self.time_index] <= time_last
@@ -591,12 +1203,9 @@ class Entity(BaseEntity):
                     if training_window is not None:
                         df = df[df[self.time_index] >= time_last - training_window]
 
-        for secondary_time_index in self.secondary_time_index:
-                # should we use ignore time last here?
-            if time_last is not None and not df.empty:
-                mask = df[secondary_time_index] >= time_last
-                second_time_index_columns = self.secondary_time_index[secondary_time_index]
-                df.loc[mask, second_time_index_columns] = np.nan
+        # should we use ignore time last here?
+        if time_last is not None and not df.empty:
+            df = self._mask_secondary_time_index(df, time_last)
 
         if columns is not None:
             df = df[columns]
@@ -621,7 +1230,94 @@ class Entity(BaseEntity):
         elif end is not None:
             df = df.iloc[0:end]
 
-        return df.copy()
+        return df
+
+    def _mask_secondary_time_index(self, df, time_last):
+        """
+        Set the variables of each secondary time index to null in rows where
+        the secondary time index is after time_last.
+
+        The masked columns are replaced rather than written to, since df may
+        share data with the entity, and columns are only copied if they have
+        values to mask.
+        """
+        for secondary_time_index, columns in self.secondary_time_index.items():
+            mask = (df[secondary_time_index] >= time_last).values
+            if not mask.any():
+                continue
+
+            for column in columns:
+                loc = df.columns.get_loc(column)
+                values = df[column].where(~mask)
+                del df[column]
+                df.insert(loc, column, values)
+        return df
+
+
+def _compact_column(column, variable, max_categorical_fraction):
+    """Return column in a smaller dtype, or column itself if there is none"""
+    if isinstance(variable, (vtypes.Datetime, vtypes.Timedelta)) or \
+            column.empty:
+        return column
+
+    dtype = column.dtype
+    if dtype.kind == 'i':
+        low, high = column.min(), column.max()
+        for compact_dtype in [np.int16, np.int32]:
+            info = np.iinfo(compact_dtype)
+            if dtype.itemsize > info.bits // 8 and \
+                    info.min <= low and high <= info.max:
+                return column.astype(compact_dtype)
+
+    elif dtype == np.float64:
+        compacted = column.astype(np.float32)
+        unchanged = compacted.astype(np.float64) == column
+        if (unchanged | column.isnull()).all():
+            return compacted
+
+    elif dtype == object:
+        if isinstance(variable, vtypes.Boolean):
+            if column.isin([True, False]).all():
+                return column.astype(bool)
+        elif isinstance(variable, vtypes.Discrete):
+            if column.nunique() <= max_categorical_fraction * len(column):
+                return column.astype('category')
+
+    return column
+
+
+def _combine_moment(stat, variable, old_count, column, new_count):
+    """
+    Combine the mean or standard deviation of a variable with those of the
+    values of added rows, using the formula for the variance of two samples
+    taken together.
+    """
+    old_mean = variable._statistics['mean']
+    new_mean = column.mean()
+    count = old_count + new_count
+    mean = old_mean + (new_mean - old_mean) * new_count / float(count)
+    if stat == 'mean':
+        return mean
+    old_std = variable._statistics['std'] if old_count > 1 else 0
+    new_std = column.std() if new_count > 1 else 0
+    squares = old_std ** 2 * (old_count - 1) + new_std ** 2 * (new_count - 1)
+    squares += (new_mean - old_mean) ** 2 * old_count * new_count / float(count)
+    return np.sqrt(squares / (count - 1))
+
+
+def _count_values(column, n=None):
+    """
+    Count the occurrences of each non-null value of a column.
+
+    Returns:
+        (pd.Series, int, int) : the counts of the n most common values, or of
+            all values if n is None, sorted in descending order, the number
+            of distinct values, and the total count of non-null values
+    """
+    counts = column.value_counts()
+    # categorical columns also count categories that do not occur
+    counts = counts[counts > 0]
+    return counts.iloc[:n], len(counts), np.sum(counts)
 
 
 def col_is_datetime(col):
@@ -632,8 +1328,10 @@ def col_is_datetime(col):
     # TODO: not sure this is ideal behavior.
     # it converts int columns that have dtype=object to datetimes starting from 1970
     elif col.dtype.name.find('str') > -1 or col.dtype.name.find('object') > -1:
+        # find the first values which are not null without copying the column
+        first_valid = np.flatnonzero(col.notnull().values)[:10]
         try:
-            pd.to_datetime(col.dropna().iloc[:10], errors='raise')
+            pd.to_datetime(col.iloc[first_valid], errors='raise')
         except:
             return False
         else:
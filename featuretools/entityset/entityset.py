@@ -1,6 +1,10 @@
 import copy
 import itertools
 import logging
+import os
+from glob import glob
+from multiprocessing import cpu_count
+from multiprocessing.pool import ThreadPool
 
 import dask.dataframe as dd
 import numpy as np
@@ -9,7 +13,8 @@ import pandas as pd
 from .base_entityset import BaseEntitySet
 from .entity import Entity
 from .relationship import Relationship
-from .serialization import read_pickle, to_pickle
+from .serialization import read_columnar, read_pickle, to_columnar, to_pickle
+from .variable_index import factorize
 
 import featuretools.variable_types.variable as vtypes
 from featuretools.utils.gen_utils import make_tqdm_iterator
@@ -18,6 +23,9 @@ from featuretools.utils.wrangle import _check_variable_list
 pd.options.mode.chained_assignment = None  # default='warn'
 logger = logging.getLogger('featuretools.entityset')
 
+# number of rows read from the first of several CSV files to infer dtypes
+_CSV_DTYPE_SAMPLE_ROWS = 10000
+
 
 class EntitySet(BaseEntitySet):
     """
@@ -99,6 +107,16 @@ class EntitySet(BaseEntitySet):
     def read_pickle(cls, path):
         return read_pickle(path)
 
+    def to_columnar(self, path):
+        to_columnar(self, path)
+        return self
+
+    @classmethod
+    def read_columnar(cls, path, entity_ids=None, columns=None,
+                      memory_map=False):
+        return read_columnar(path, entity_ids=entity_ids, columns=columns,
+                             memory_map=memory_map)
+
     ###########################################################################
     #  Public API methods  ###################################################
     ###########################################################################
@@ -116,6 +134,73 @@ class EntitySet(BaseEntitySet):
         self.entity_stores = full_entities
         return sampled
 
+    def sample_entityset(self, target_entity, n_instances, seed=None):
+        """
+        Create a smaller entityset from a random sample of the instances of
+        one entity.
+
+        Unlike :meth:`.get_sample`, which samples every entity on its own,
+        the sample keeps only the rows of other entities which are related to
+        the sampled instances, as well as every parent row they refer to, so
+        that all relationships in the sample are complete.
+
+        Args:
+            target_entity (str) : id of the entity to sample instances from
+            n_instances (int) : number of instances to sample
+            seed (int, optional) : random seed used to pick the instances
+
+        Returns:
+            :class:`.EntitySet` : entityset with the sampled data
+        """
+        instance_ids = self.sample_instances(target_entity, n_instances,
+                                             random_seed=seed)
+        frames = {}
+        for entity in self.entities:
+            if entity.id == target_entity or \
+                    self.find_path(target_entity, entity.id):
+                frames[entity.id] = self._related_instances(
+                    target_entity, entity.id, instance_ids=instance_ids)
+            else:
+                frames[entity.id] = entity.query_by_values([])
+
+        # every row needs the parent rows it refers to, which may in turn
+        # refer to grandparents that are not in the sample yet
+        added = True
+        while added:
+            added = False
+            for r in self.relationships:
+                child_id = r.child_entity.id
+                parent_id = r.parent_entity.id
+                values = frames[child_id][r.child_variable.id].dropna()
+                missing = values[~values.isin(frames[parent_id].index)]
+                if not len(missing):
+                    continue
+                rows = self.entity_stores[parent_id].query_by_values(
+                    missing.unique())
+                if len(rows):
+                    frames[parent_id] = pd.concat([frames[parent_id], rows])
+                    added = True
+
+        sampled = EntitySet(self.id, verbose=self._verbose)
+        for entity in self.entities:
+            variable_types = {v.id: type(v) for v in entity.variables}
+            sampled.entity_from_dataframe(
+                entity.id, frames[entity.id],
+                index=entity.index,
+                variable_types=variable_types,
+                time_index=entity.time_index,
+                secondary_time_index=entity.secondary_time_index,
+                encoding=entity.encoding,
+                copy=False)
+            for variable in entity.variables:
+                sampled_variable = sampled[entity.id][variable.id]
+                sampled_variable.interesting_values = variable.interesting_values
+        for r in self.relationships:
+            sampled.add_relationship(Relationship(
+                sampled[r.parent_entity.id][r.parent_variable.id],
+                sampled[r.child_entity.id][r.child_variable.id]))
+        return sampled
+
     def head(self, entity_id, n=10, variable_id=None, cutoff_time=None):
         if variable_id is None:
             return self.entity_stores[entity_id].head(
@@ -139,9 +224,9 @@ class EntitySet(BaseEntitySet):
         entity = self.entity_stores[entity_id]
         return entity.get_top_n_instances(top_n)
 
-    def sample_instances(self, entity_id, n=10):
+    def sample_instances(self, entity_id, n=10, random_seed=None):
         entity = self.entity_stores[entity_id]
-        return entity.sample_instances(n)
+        return entity.sample_instances(n, random_seed=random_seed)
 
     def get_sliced_instance_ids(self, entity_id, start, end, random_seed=None, shuffle=False):
         entity = self.entity_stores[entity_id]
@@ -170,7 +255,8 @@ class EntitySet(BaseEntitySet):
                                                      final_entity_id=filter_eid,
                                                      instance_ids=instances,
                                                      time_last=time_last,
-                                                     training_window=training_window)
+                                                     training_window=training_window,
+                                                     copy=False)
 
             eframes = {filter_eid: toplevel_slice}
 
@@ -198,7 +284,8 @@ class EntitySet(BaseEntitySet):
                 eframes[child_eid] =\
                     self.entity_stores[child_eid].query_by_values(
                         instance_vals, variable_id=r.child_variable.id,
-                        time_last=time_last, training_window=window)
+                        time_last=time_last, training_window=window,
+                        copy=False)
 
                 # add link variables to this dataframe in order to link it to its
                 # (grand)parents
@@ -226,7 +313,7 @@ class EntitySet(BaseEntitySet):
         """
         Return a list of the columns on the underlying data store
         """
-        return self.entity_stores[entity_id].df.columns
+        return self.entity_stores[entity_id]._get_column_names()
 
     def get_index(self, entity_id):
         """
@@ -331,14 +418,20 @@ class EntitySet(BaseEntitySet):
                         time_index_components=None,
                         parse_date_cols=None,
                         encoding=None,
+                        n_jobs=None,
                         **kwargs):
         """
-        Load the data for a specified entity from a CSV file.
+        Load the data for a specified entity from one or more CSV files.
 
         Args:
             entity_id (str) : unique id to associate with this entity
 
-            csv_path (str) : path to the file containing the data
+            csv_path (str or list[str]) : path to the file containing the
+                data, or a list of paths. Paths can contain "*" wildcards.
+                Multiple files are read in parallel, parsing columns with
+                the dtypes inferred from the start of the first file. If the
+                values of a column do not fit in some file, the column is
+                parsed as a wider number type, or as strings, in every file.
 
             index (str, optional): Name of the variable used to index the entity.
                 If None, take the first column
@@ -373,6 +466,9 @@ class EntitySet(BaseEntitySet):
                 pandas.read_csv() and pandas.to_csv() calls, so see Pandas documentation
                 for more information
 
+            n_jobs (Optional(int)) : number of threads to read files with.
+                Defaults to one thread per file, up to the number of CPUs.
+
             **kwargs : Extra arguments will be passed to :func:`pd.read_csv`
         """
 
@@ -383,7 +479,12 @@ class EntitySet(BaseEntitySet):
         if parse_date_cols:
             parse_date_cols = parse_date_cols or []
 
-        def load_df(e, csv_path):
+        if time_index_components:
+            parse_dates = {time_index: time_index_components}
+        else:
+            parse_dates = parse_date_cols
+
+        def load_df(csv_path, **read_kwargs):
             ext = csv_path.split('.')[-1]
             compression = None
             compression_formats = ['bz2', 'gzip']
@@ -392,53 +493,74 @@ class EntitySet(BaseEntitySet):
             elif ext != 'csv':
                 raise ValueError("Unknown extension: %s", ext)
 
-            read_csv = pd.read_csv
-            glob = False
+            options = dict(low_memory=False,
+                           parse_dates=parse_dates,
+                           compression=compression,
+                           usecols=use_variables,
+                           encoding=encoding)
+            options.update(kwargs)
+            options.update(read_kwargs)
 
             if "*" in csv_path:
-                glob = True
-                # read dask dataframe from multiple files
-                read_csv = dd.read_csv
-                kwargs['blocksize'] = None
-
-            if time_index_components:
-                parse_dates = {time_index: time_index_components}
-                df = read_csv(csv_path, low_memory=False,
-                              parse_dates=parse_dates,
-                              compression=compression,
-                              usecols=use_variables,
-                              encoding=encoding,
-                              **kwargs)
-            else:
-                df = read_csv(csv_path, low_memory=False,
-                              parse_dates=parse_date_cols,
-                              compression=compression,
-                              usecols=use_variables,
-                              encoding=encoding,
-                              **kwargs)
-
-            if glob:
-                # convert dask dataframe back to pandas
-                if e:
-                    df = e.compute(df)
-                else:
-                    df = df.compute()
-            return df
+                # read dask dataframe from multiple remote files, and convert
+                # it back to pandas. Compressed files cannot be split into
+                # blocks, but uncompressed files are read in parallel blocks
+                if compression is not None:
+                    options['blocksize'] = None
+                return dd.read_csv(csv_path, **options).compute()
+            return pd.read_csv(csv_path, **options)
 
-        # handle if we are working list of csv_path
-        # TODO: handle multiple csvs using dask so that they will be downloaded in parallel
-        dfs = []
         if not isinstance(csv_path, list):
             csv_path = [csv_path]
-
-        # DFS todo: what about
-        # # try:
-        #         with worker_client() as e:
-        #             df = load_df(e, csv)
-        #     except AttributeError:
-        for csv in csv_path:
-            df = load_df(None, csv)
-            dfs.append(df)
+        csv_paths = []
+        for path in csv_path:
+            if "*" in path and "://" not in path:
+                csv_paths += sorted(glob(os.path.expanduser(path))) or [path]
+            else:
+                csv_paths.append(path)
+
+        # infer dtypes once from the start of the first file and use them for
+        # every file, so that the files are parsed consistently
+        dtypes = None
+        if len(csv_paths) > 1 and "*" not in csv_paths[0]:
+            sample = load_df(csv_paths[0], nrows=_CSV_DTYPE_SAMPLE_ROWS)
+            date_cols = [time_index] if time_index_components else \
+                parse_date_cols or []
+            dtypes = {column: dtype for column, dtype in sample.dtypes.iteritems()
+                      if dtype.kind in 'biufO' and column not in date_cols}
+            dtypes.update(kwargs.get('dtype') or {})
+
+        def load_with_dtypes(path):
+            if dtypes is None:
+                return load_df(path)
+            try:
+                return load_df(path, dtype=dtypes)
+            except (TypeError, ValueError):
+                # the values of this file do not fit the sampled dtypes
+                return None
+
+        def load_all(load):
+            if len(csv_paths) == 1:
+                return [load(csv_paths[0])]
+            pool = ThreadPool(n_jobs or min(len(csv_paths), cpu_count()))
+            try:
+                return pool.map(load, csv_paths)
+            finally:
+                pool.close()
+                pool.join()
+
+        dfs = load_all(load_with_dtypes)
+        failed = [path for path, df in zip(csv_paths, dfs) if df is None]
+        if failed:
+            # widen the columns which do not fit to a dtype which fits the
+            # values of every file, and read every file with it again
+            user_dtypes = kwargs.get('dtype') or {}
+            for path in failed:
+                for column, dtype in load_df(path).dtypes.iteritems():
+                    if column in dtypes and column not in user_dtypes and \
+                            dtype != dtypes[column]:
+                        dtypes[column] = _widen_dtype(dtypes[column], dtype)
+            dfs = load_all(lambda path: load_df(path, dtype=dtypes))
 
         df = pd.concat(dfs)
 
@@ -459,7 +581,8 @@ class EntitySet(BaseEntitySet):
                               time_index=None,
                               secondary_time_index=None,
                               encoding=None,
-                              already_sorted=False):
+                              already_sorted=False,
+                              copy=True):
         """
         Load the data for a specified entity from a Pandas DataFrame.
 
@@ -492,7 +615,15 @@ class EntitySet(BaseEntitySet):
                 so see Pandas documentation for more information.
 
             already_sorted (Optional[boolean]) : If True, assumes that input dataframe is already sorted by time.
-                Defaults to False.
+                Defaults to False. Dataframes which are sorted are detected and
+                kept in their order either way.
+
+            copy (Optional[boolean]) : If False, the entity takes ownership of
+                dataframe instead of working on a copy of it. Its columns and
+                index are then converted in place, so the dataframe should not
+                be used afterwards. Avoids holding two copies of large data
+                while loading. Rows which are not sorted by time_index are
+                still copied once to sort them. Defaults to True.
 
         Notes:
 
@@ -522,7 +653,9 @@ class EntitySet(BaseEntitySet):
         # If time index components are passed, combine them into a single column
         # TODO look into handling secondary_time_index here
         # _operations?
-        return self._import_from_dataframe(entity_id, dataframe.copy(), index=index,
+        if copy:
+            dataframe = dataframe.copy()
+        return self._import_from_dataframe(entity_id, dataframe, index=index,
                                            make_index=make_index,
                                            time_index=time_index,
                                            secondary_time_index=secondary_time_index,
@@ -598,18 +731,17 @@ class EntitySet(BaseEntitySet):
         current_relationships = [r for r in self.relationships
                                  if r.parent_entity.id == entity_id or
                                  r.child_entity.id == entity_id]
-        # "category" dtype generates a lot of errors because pandas treats it
-        # differently in merges. In particular, if there are no matching
-        # instances on a dataframe to join, the new joined dataframe turns out
-        # to be empty if the column we're joining on is a category
-        # When its any other dtype, we get the same number of rows as the
-        # original dataframe but filled in with nans
-
+        # "category" columns are stored as is, as integer codes into their
+        # categories. Lookups and joins on them go through the codes (see
+        # variable_index.get_key_positions), so they never get expanded to
+        # objects. The index of the entity is the exception: it is used as the
+        # index of the dataframe, so it is stored as its values
         df = dataframe
         for c in df.columns:
             if df[c].dtype.name.find('category') > -1:
-                df[c] = df[c].astype(object)
-                if c not in variable_types:
+                if c == index:
+                    df[c] = np.asarray(df[c])
+                elif c not in variable_types:
                     variable_types[c] = vtypes.Categorical
         if df.index.dtype.name.find('category') > -1:
             df.index = df.index.astype(object)
@@ -713,12 +845,12 @@ class EntitySet(BaseEntitySet):
         for v in additional_variables + copy_variables:
             transfer_types[v] = type(base_entity[v])
 
-        # create and add new entity
-        new_entity_df = self.get_dataframe(base_entity_id)
-
         if make_time_index is None and base_entity.has_time_index():
             make_time_index = True
 
+        # positions of the base entity's rows in the order instances of the
+        # new entity are reduced in, or None to use their current order
+        order = None
         if isinstance(make_time_index, (str, unicode)):
             base_time_index = make_time_index
             new_entity_time_index = base_entity[make_time_index].id
@@ -735,7 +867,7 @@ class EntitySet(BaseEntitySet):
 
             transfer_types[new_entity_time_index] = type(base_entity[base_entity.time_index])
 
-            new_entity_df.sort_values([base_time_index, base_entity.index], kind="mergesort", inplace=True)
+            order = base_entity._get_time_order(base_time_index)
         else:
             new_entity_time_index = None
 
@@ -743,44 +875,52 @@ class EntitySet(BaseEntitySet):
             [v for v in additional_variables] +\
             [v for v in copy_variables]
 
-        new_entity_df2 = new_entity_df. \
-            drop_duplicates(index, keep=time_index_reduce)[selected_variables]
+        # each instance of the new entity is made from the first or last row
+        # of the base entity with its value of index, with null values making
+        # up one instance. Only the rows which are kept and the selected
+        # columns are copied out of the base entity
+        codes, uniques = factorize(base_entity._get_column_values(index))
+        num_codes = len(uniques)
+        if (codes < 0).any():
+            codes[codes < 0] = num_codes
+            num_codes += 1
+        instance_codes, rows = _reduce_rows(codes, order, time_index_reduce)
+        new_entity_df = base_entity._take_columns(selected_variables, rows)
 
         if make_time_index:
-            new_entity_df2.rename(columns={base_time_index: new_entity_time_index}, inplace=True)
+            new_entity_df.rename(columns={base_time_index: new_entity_time_index}, inplace=True)
         if make_secondary_time_index:
-            time_index_reduce = 'first'
-
             assert len(make_secondary_time_index) == 1, "Can only provide 1 secondary time index"
             secondary_time_index = make_secondary_time_index.keys()[0]
-            secondary_variables = [index, secondary_time_index] + make_secondary_time_index.values()[0]
-            secondary_df = new_entity_df. \
-                drop_duplicates(index, keep='last')[secondary_variables]
+            secondary_variables = [secondary_time_index] + make_secondary_time_index.values()[0]
+
+            # the secondary time index always reduces using the last row
+            secondary_codes, secondary_rows = _reduce_rows(codes, order, 'last')
+            rows_by_code = np.empty(num_codes, dtype=np.int64)
+            rows_by_code[secondary_codes] = secondary_rows
+            secondary_df = base_entity._take_columns(secondary_variables,
+                                                     rows_by_code[instance_codes])
             if new_entity_secondary_time_index:
                 secondary_df.rename(columns={secondary_time_index: new_entity_secondary_time_index},
                                     inplace=True)
             else:
                 new_entity_secondary_time_index = secondary_time_index
-            secondary_df.set_index(index, inplace=True)
-            new_entity_df = new_entity_df2.join(secondary_df, on=index)
-        else:
-            new_entity_df = new_entity_df2
+            for v in secondary_df.columns:
+                new_entity_df[v] = secondary_df[v].values
 
         base_entity_index = index
         if convert_links_to_integers:
-            old_entity_df = self.get_dataframe(base_entity_id)
             link_variable_id = self.make_index_variable_name(new_entity_id)
             new_entity_df[link_variable_id] = np.arange(0, new_entity_df.shape[0])
 
-            just_index = old_entity_df[[index]]
-            id_as_int = just_index.merge(new_entity_df,
-                                         left_on=index,
-                                         right_on=index,
-                                         how='left')[link_variable_id]
+            links_by_code = np.empty(num_codes, dtype=np.int64)
+            links_by_code[instance_codes] = np.arange(len(instance_codes))
+            links = links_by_code.take(codes)
 
-            old_entity_df.loc[:, index] = id_as_int.values
-
-            base_entity.update_data(old_entity_df)
+            base_entity.df[index] = links
+            if base_entity.indexed_by.get(index) is not None:
+                base_entity.indexed_by[index] = None
+            base_entity.add_variable_statistics(index)
 
             index = link_variable_id
 
@@ -934,6 +1074,17 @@ class EntitySet(BaseEntitySet):
             [self.delete_column(entity.id, v.id) for v in to_combine]
             [entity.delete_variable(v.id) for v in to_combine]
 
+    def append(self, entity_id, df):
+        """
+        Add rows to an entity. See :meth:`.Entity.append_rows`.
+
+        Args:
+            entity_id (str) : id of the entity to add rows to
+            df (pd.DataFrame) : rows to add
+        """
+        self.entity_stores[entity_id].append_rows(df)
+        return self
+
     def concat(self, other, inplace=False):
         '''Combine entityset with another to create a new entityset with the
         combined data of both entitysets.
@@ -965,8 +1116,16 @@ class EntitySet(BaseEntitySet):
                            col != entity.index or col != entity.time_index]
             else:
                 columns = [entity.index]
-            combined_df.drop_duplicates(columns, inplace=True)
-            combined_es[entity.id].update_data(combined_df)
+            keep = ~combined_df.duplicated(columns).values
+            combined_df = combined_df[keep]
+
+            # if every row of self is kept, the rows of other are appended
+            # and the indexes can be extended instead of rebuilt
+            num_unchanged_rows = 0
+            if keep[:self_df.shape[0]].all():
+                num_unchanged_rows = self_df.shape[0]
+            combined_es[entity.id].update_data(combined_df,
+                                               num_unchanged_rows=num_unchanged_rows)
 
         return combined_es
 
@@ -988,13 +1147,41 @@ class EntitySet(BaseEntitySet):
 
     def index_data(self, r):
         """
-        If necessary, generate an index on the data which links instances of
+        If necessary, register an index on the data which links instances of
         parent entities to collections of child instances which link to them.
+        The index itself is built the first time it is queried, or by
+        :meth:`.build_indexes`.
         """
         parent_entity = self.entity_stores[r.parent_variable.entity.id]
         child_entity = self.entity_stores[r.child_variable.entity.id]
         child_entity.index_by_parent(parent_entity=parent_entity)
 
+    def build_indexes(self, n_jobs=None):
+        """
+        Build all relationship indexes which have not been built yet, instead
+        of waiting for them to be built when they are first queried.
+
+        Args:
+            n_jobs (int, optional) : number of threads to build indexes with.
+                Defaults to one thread per index.
+        """
+        to_build = [(entity, variable_id) for entity in self.entities
+                    for variable_id in entity.get_unbuilt_indexes()]
+        if not to_build:
+            return self
+
+        def build(entity_and_variable):
+            entity, variable_id = entity_and_variable
+            entity.index_by_variable(variable_id)
+
+        pool = ThreadPool(n_jobs or len(to_build))
+        try:
+            pool.map(build, to_build)
+        finally:
+            pool.close()
+            pool.join()
+        return self
+
     ###########################################################################
     #  Other ###############################################
     ###########################################################################
@@ -1014,6 +1201,46 @@ class EntitySet(BaseEntitySet):
         for entity in self.entities:
             entity.add_interesting_values(max_values=max_values, verbose=verbose)
 
+    def optimize_memory(self, max_categorical_fraction=0.5, verbose=False):
+        """Store the columns of every entity in the smallest dtypes that
+            hold their values exactly. See :meth:`.Entity.optimize_memory`.
+
+        Args:
+            max_categorical_fraction (float) : largest ratio of distinct
+                values to rows for which a discrete column is converted to a
+                categorical
+            verbose (bool) : If True, log the memory used before and after
+
+        Returns:
+            pd.DataFrame : dtype and memory usage in bytes of each column
+                before and after, indexed by entity id and variable id
+        """
+        reports = [entity.optimize_memory(max_categorical_fraction)
+                   for entity in self.entities]
+        report = pd.concat(reports, keys=[e.id for e in self.entities],
+                           names=['entity', 'variable'])
+        if verbose:
+            msg = "Memory usage of {}: {} bytes before, {} bytes after"
+            logger.info(msg.format(self.id, report['memory_before'].sum(),
+                                   report['memory_after'].sum()))
+        return report
+
+    def store_columns(self, path, entity_ids=None):
+        """Move the data of entities out of memory, into memory-mapped files.
+            See :meth:`.Entity.store_columns`.
+
+        Args:
+            path (str) : directory to store the entities in, one
+                subdirectory per entity
+            entity_ids (list[str], optional) : entities to store. Stores all
+                entities if None.
+        """
+        if entity_ids is None:
+            entity_ids = [e.id for e in self.entities]
+        for entity_id in entity_ids:
+            self.entity_stores[entity_id].store_columns(os.path.join(path, entity_id))
+        return self
+
     ###########################################################################
     #  Private methods  ######################################################
     ###########################################################################
@@ -1021,7 +1248,7 @@ class EntitySet(BaseEntitySet):
     # TODO: public?
     def _related_instances(self, start_entity_id, final_entity_id,
                            instance_ids=None, time_last=None, add_link=False,
-                           training_window=None):
+                           training_window=None, copy=True):
         """
         Filter out all but relevant information from dataframes along path
         from start_entity_id to final_entity_id,
@@ -1036,16 +1263,21 @@ class EntitySet(BaseEntitySet):
             add_link (bool) : if True, add a link variable from the first
                 entity in the path to the last. Assumes the path is made up of
                 only backwards relationships.
+            copy (bool) : if False, the returned dataframe may share data with
+                the entity. See :meth:`.Entity.query_by_values`.
 
         Returns:
             pd.DataFrame : Dataframe of related instances on the final_entity_id
         """
+        # get relationship path from start to end entity
+        path = self.find_path(start_entity_id, final_entity_id)
+
         # Load the filtered dataframe for the first entity
         training_window_is_dict = isinstance(training_window, dict)
         window = training_window
         start_estore = self.entity_stores[start_entity_id]
         if instance_ids is None:
-            df = start_estore.df
+            df = start_estore.query_by_values(None, copy=copy and not path)
         else:   # instance_ids was passed in
             # This check might be brittle
             if not hasattr(instance_ids, '__iter__'):
@@ -1053,17 +1285,17 @@ class EntitySet(BaseEntitySet):
 
             if training_window_is_dict:
                 window = training_window.get(start_estore.id)
+            # only the frame which is returned needs to be copied
             df = start_estore.query_by_values(instance_ids,
                                               time_last=time_last,
-                                              training_window=window)
+                                              training_window=window,
+                                              copy=copy and not path)
 
         # if we're querying on a path that's not actually a path, just return
         # the relevant slice of the entityset
         if start_entity_id == final_entity_id:
             return df
 
-        # get relationship path from start to end entity
-        path = self.find_path(start_entity_id, final_entity_id)
         if path is None or len(path) == 0:
             return pd.DataFrame()
 
@@ -1071,7 +1303,8 @@ class EntitySet(BaseEntitySet):
             assert 'forward' not in self.path_relationships(path,
                                                             start_entity_id)
             rvar = path[0].get_entity_variable(start_entity_id)
-            link_map = {i: i for i in df[rvar]}
+            # the start instance each row of df is linked to
+            link_values = df[rvar].values
 
         prev_entity_id = start_entity_id
 
@@ -1090,21 +1323,19 @@ class EntitySet(BaseEntitySet):
             df = entity_store.query_by_values(all_ids,
                                               variable_id=rvar_new,
                                               time_last=time_last,
-                                              training_window=window)
+                                              training_window=window,
+                                              copy=copy and i == len(path) - 1)
 
-            # group the rows in the new dataframe by the instances of the first
-            # dataframe, and add a new column linking the two.
+            # look up the start instance of each row's parent, and add a new
+            # column linking the two.
             if add_link:
-                new_link_map = {}
-                for parent_ix, gdf in df.groupby(rvar_new):
-                    for child_ix in gdf.index:
-                        new_link_map[child_ix] = link_map[parent_ix]
-                link_map = new_link_map
+                parent_positions = pd.Index(all_ids.values).get_indexer(df[rvar_new].values)
+                link_values = link_values.take(parent_positions)
 
                 child_link_var = \
                     Relationship._get_link_variable_name(path[:i + 1])
                 if child_link_var not in df.columns:
-                    df = df.join(pd.Series(link_map, name=child_link_var))
+                    df[child_link_var] = link_values
 
             prev_entity_id = new_entity_id
 
@@ -1174,17 +1405,22 @@ class EntitySet(BaseEntitySet):
                     # print 'adding link var %s to entity %s' % (child_link_name,
                     #                                            child_entity.id)
 
-                    # create an intermeidate dataframe which shares a column
-                    # with the child dataframe and has a column with the
-                    # original parent's id.
-                    col_map = {r.parent_variable.id: r.child_variable.id,
-                               parent_link_name: child_link_name}
-                    merge_df = parent_df[col_map.keys()].rename(columns=col_map)
-
-                    # merge the dataframe, adding the link variable to the child
-                    frames[child_entity.id] = pd.merge(left=merge_df,
-                                                       right=child_df,
-                                                       on=r.child_variable.id)
+                    # look up the parent row of each child row, and take
+                    # the parent's link variable from it. Like an inner join,
+                    # child rows without a parent are dropped.
+                    parent_positions = pd.Index(parent_df[r.parent_variable.id].values)\
+                        .get_indexer(child_df[r.child_variable.id].values)
+                    has_parent = parent_positions >= 0
+                    if has_parent.all():
+                        # shallow copy so the column isn't added to the input
+                        child_df = child_df.copy(deep=False)
+                    else:
+                        child_df = child_df.iloc[np.flatnonzero(has_parent)]
+                        parent_positions = parent_positions[has_parent]
+
+                    link_values = parent_df[parent_link_name].values
+                    child_df[child_link_name] = link_values.take(parent_positions)
+                    frames[child_entity.id] = child_df
 
     def gen_relationship_var(self, child_eid, parent_eid):
         path = self.find_path(parent_eid, child_eid)
@@ -1196,3 +1432,34 @@ class EntitySet(BaseEntitySet):
             child_link_name = '%s.%s' % (parent_entity.id,
                                          parent_link_name)
         return child_link_name
+
+
+def _widen_dtype(dtype, other):
+    """
+    Get a dtype to parse a column with, whose values are parsed as dtype in
+    some files and as other in others. Numbers are parsed as the wider type
+    of number, and anything else as strings, so that equal text is always
+    parsed as the same value.
+    """
+    dtype, other = np.dtype(dtype), np.dtype(other)
+    if dtype.kind in 'iuf' and other.kind in 'iuf':
+        return np.promote_types(dtype, other)
+    return str
+
+
+def _reduce_rows(codes, order, keep):
+    """
+    Find the first or last row with each value of an array of codes, like
+    drop_duplicates does, for rows in the order given by order, or in their
+    current order if order is None.
+
+    Returns:
+        tuple(np.ndarray, np.ndarray) : codes and positions of the rows which
+            are kept, in the order the rows appear
+    """
+    ordered_codes = codes if order is None else codes[order]
+    ranks = pd.Series(np.arange(len(ordered_codes)))
+    grouped = ranks.groupby(ordered_codes, sort=False)
+    ranks = getattr(grouped, keep)().sort_values()
+    rows = ranks.values if order is None else order[ranks.values]
+    return ranks.index.values.astype(np.int64), rows
@@ -1,3 +1,4 @@
+import gzip
 import logging
 import os
 import shutil
@@ -7,12 +8,18 @@ from pandas import Timestamp, read_csv
 from pandas.io.pickle import read_pickle as pd_read_pickle
 from pandas.io.pickle import to_pickle as pd_to_pickle
 
+from .column_store import ColumnStore
+
 from featuretools import variable_types as vtypes
 
 logger = logging.getLogger('featuretools.entityset')
 
 _datetime_types = vtypes.PandasTypes._pandas_datetimes
 
+# number of rows of an entity stored in a ColumnStore to write to a CSV file
+# at a time
+_CSV_CHUNK_SIZE = 100000
+
 
 def to_pickle(entityset, path):
     """Save the entityset at the given path.
@@ -41,24 +48,28 @@ def to_pickle(entityset, path):
         entity_path = os.path.join(temp_dir, e_id)
         filename = e_id + '.csv'
         os.mkdir(entity_path)
-        entity_store.df.to_csv(os.path.join(entity_path, filename),
-                               index=False,
-                               encoding=entity_store.encoding,
-                               compression='gzip')
+        _write_csv(entity_store, os.path.join(entity_path, filename))
         entity_sizes[e_id] = \
             os.stat(os.path.join(entity_path, filename)).st_size
         datatypes = {'dtype': {}, 'parse_dates': []}
-        for column in entity_store.df.columns:
+        for column in entity_store._get_column_names():
             if entity_store.get_column_type(column) in _datetime_types:
                 datatypes['parse_dates'].append(column)
             else:
-                datatypes['dtype'][column] = entity_store.df[column].dtype
+                datatypes['dtype'][column] = \
+                    entity_store._get_column_dtype(column)
         pd_to_pickle(datatypes, os.path.join(entity_path, 'datatypes.p'))
 
-        entity_store_dframes[e_id] = entity_store.df
-        entity_store.df = None
+        entity_store_dframes[e_id] = (entity_store._df,
+                                      entity_store.column_store)
+        entity_store._df = None
+        entity_store.column_store = None
 
-        pd_to_pickle(entity_store.indexed_by, os.path.join(entity_path, 'indexed_by.p'))
+        # only the indexed variables are saved, their indexes are rebuilt
+        # when they are first needed after loading
+        indexed_by = {variable_id: None for variable_id
+                      in entity_store.indexed_by}
+        pd_to_pickle(indexed_by, os.path.join(entity_path, 'indexed_by.p'))
 
         entity_store_index_bys[e_id] = entity_store.indexed_by
         entity_store.indexed_by = None
@@ -70,7 +81,9 @@ def to_pickle(entityset, path):
     pd_to_pickle(entityset, os.path.join(temp_dir, 'entityset.p'))
 
     for e_id, entity_store in entityset.entity_stores.items():
-        setattr(entity_store, 'df', entity_store_dframes[e_id])
+        df, column_store = entity_store_dframes[e_id]
+        entity_store._df = df
+        entity_store.column_store = column_store
         setattr(entity_store, 'indexed_by', entity_store_index_bys[e_id])
 
     # can use a lock here if need be
@@ -79,6 +92,30 @@ def to_pickle(entityset, path):
     shutil.move(temp_dir, entityset_path)
 
 
+def _write_csv(entity_store, path):
+    """
+    Write the data of an entity to a gzipped CSV file. Entities stored in a
+    :class:`.ColumnStore` are read and written a chunk of rows at a time,
+    rather than loaded into memory.
+    """
+    column_store = entity_store.column_store
+    if column_store is None:
+        entity_store.df.to_csv(path,
+                               index=False,
+                               encoding=entity_store.encoding,
+                               compression='gzip')
+        return
+
+    with gzip.open(path, 'wb') as f:
+        for start in range(0, max(len(column_store), 1), _CSV_CHUNK_SIZE):
+            chunk = column_store.read(rows=slice(start,
+                                                 start + _CSV_CHUNK_SIZE))
+            chunk.to_csv(f,
+                         index=False,
+                         header=start == 0,
+                         encoding=entity_store.encoding)
+
+
 def read_pickle(path):
     """
     Read an EntitySet from disk. Assumes EntitySet has been saved using
@@ -104,9 +141,135 @@ def read_pickle(path):
         entity_store_df.set_index(entity_store_df[entity_store.index],
                                   drop=False, inplace=True)
         setattr(entity_store, 'df', entity_store_df)
+        # entitysets saved by older versions have indexes in another format,
+        # so indexes are always rebuilt rather than loaded
         indexed_by = pd_read_pickle(os.path.join(entity_path, 'indexed_by.p'))
-        setattr(entity_store, 'indexed_by', indexed_by)
+        setattr(entity_store, 'indexed_by',
+                {variable_id: None for variable_id in indexed_by})
+
+    assert entityset is not None, "EntitySet not loaded properly"
+
+    return entityset
+
+
+def to_columnar(entityset, path):
+    """Save the entityset at the given path in a binary columnar format.
+
+    Every column of every entity is saved in its own file (see
+    :class:`.ColumnStore`), so entities and columns can be loaded
+    separately, and memory-mapped instead of read.
+
+       Args:
+           entityset (:class:`featuretools.BaseEntitySet`) : EntitySet to save
+           path : pathname of a directory to save the entityset
+            (includes a directory of column files for each entity, as well
+            as a metadata pickle file)
+
+    """
+    entityset_path = os.path.abspath(os.path.expanduser(path))
+    temp_dir = mkdtemp()
+
+    entity_store_data = {}
+    try:
+        for e_id, entity_store in entityset.entity_stores.items():
+            entity_path = os.path.join(temp_dir, e_id)
+            if entity_store.column_store is not None:
+                shutil.copytree(entity_store.column_store.path, entity_path)
+            else:
+                ColumnStore.write(entity_store.df, entity_path,
+                                  entity_store.index)
+
+            entity_store_data[e_id] = (entity_store._df,
+                                       entity_store.column_store,
+                                       entity_store.indexed_by)
+            entity_store._df = None
+            entity_store.column_store = None
+            # indexes are rebuilt when they are first needed after loading
+            entity_store.indexed_by = {variable_id: None for variable_id
+                                       in entity_store.indexed_by}
+
+        timestamp = Timestamp.now().isoformat()
+        with open(os.path.join(temp_dir, 'save_time.txt'), 'w') as f:
+            f.write(timestamp)
+        pd_to_pickle(entityset, os.path.join(temp_dir, 'entityset.p'))
+    except Exception:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        raise
+    finally:
+        # the data is put back even if saving failed
+        for e_id, (df, column_store, indexed_by) in entity_store_data.items():
+            entity_store = entityset.entity_stores[e_id]
+            entity_store._df = df
+            entity_store.column_store = column_store
+            entity_store.indexed_by = indexed_by
+
+    if os.path.exists(entityset_path):
+        shutil.rmtree(entityset_path)
+    shutil.move(temp_dir, entityset_path)
+
+
+def read_columnar(path, entity_ids=None, columns=None, memory_map=False):
+    """
+    Read an EntitySet from disk. Assumes EntitySet has been saved using
+    :meth:`.to_columnar()`.
 
+    Args:
+        path (str): Path of directory where entityset is stored
+        entity_ids (list[str], optional): Entities to load. Relationships
+            between an entity which is loaded and one which is not are
+            dropped. Loads all entities if None.
+        columns (dict[str -> list[str]], optional): Variables to load for
+            each entity id. The index, time indexes, and variables in
+            relationships are always loaded. Loads all variables of entities
+            which are not in the dictionary.
+        memory_map (bool): If True, leave the entities in memory-mapped files
+            rather than reading them into memory. See
+            :meth:`.Entity.store_columns`.
+    """
+    entityset_path = os.path.abspath(os.path.expanduser(path))
+    entityset = pd_read_pickle(os.path.join(entityset_path, 'entityset.p'))
     assert entityset is not None, "EntitySet not loaded properly"
 
+    if entity_ids is not None:
+        entityset.relationships = [r for r in entityset.relationships
+                                   if r.parent_entity.id in entity_ids and
+                                   r.child_entity.id in entity_ids]
+        entityset.entity_stores = {e_id: entity_store for e_id, entity_store
+                                   in entityset.entity_stores.items()
+                                   if e_id in entity_ids}
+
+    columns = columns or {}
+    for e_id, entity_store in entityset.entity_stores.items():
+        entity_path = os.path.join(entityset_path, e_id)
+        entity_columns = columns.get(e_id)
+        if entity_columns is not None:
+            entity_columns = _get_columns_to_load(entityset, entity_store,
+                                                  entity_columns)
+            for variable in list(entity_store.variables):
+                if variable.id not in entity_columns:
+                    entity_store.delete_variable(variable.id)
+
+        link_variables = set(r.get_entity_variable(e_id)
+                             for r in entityset.relationships
+                             if e_id in [r.parent_entity.id, r.child_entity.id])
+        entity_store.indexed_by = {variable_id: None for variable_id
+                                   in entity_store.indexed_by
+                                   if variable_id in link_variables}
+
+        column_store = ColumnStore(entity_path, columns=entity_columns)
+        if memory_map:
+            entity_store.column_store = column_store
+        else:
+            entity_store.df = column_store.read()
+
     return entityset
+
+
+def _get_columns_to_load(entityset, entity_store, columns):
+    needed = [entity_store.index, entity_store.time_index]
+    for time_index, associated in entity_store.secondary_time_index.items():
+        needed += [time_index] + list(associated)
+    for r in entityset.relationships:
+        if entity_store.id in [r.parent_entity.id, r.child_entity.id]:
+            needed.append(r.get_entity_variable(entity_store.id))
+    return set(columns).union(needed)
@@ -0,0 +1,218 @@
+import numpy as np
+import pandas as pd
+from pandas.api.types import is_categorical_dtype
+
+
+class VariableIndex(object):
+    """Maps values of a variable to the rows of an entity that contain them
+
+    The index is stored in a compressed sparse row layout: `positions` holds
+    the row positions of the entity's dataframe grouped by value, and the
+    rows for the value in slot `i` are `positions[offsets[i]:offsets[i + 1]]`.
+    Within each group, positions are kept in ascending order, so they follow
+    the sort order of the underlying dataframe. `keys` is a :class:`pd.Index`
+    used as a hash map from value to slot.
+    """
+
+    def __init__(self, keys, positions, offsets):
+        self.keys = keys
+        self.positions = positions
+        self.offsets = offsets
+
+    @classmethod
+    def from_values(cls, values):
+        """Build an index over an array of values
+
+        Args:
+            values (np.ndarray, pd.Series) : values of the variable, one per
+                row of the dataframe being indexed
+
+        Returns:
+            :class:`.VariableIndex`
+        """
+        codes, uniques = factorize(values)
+
+        # null values are not indexed
+        positions = np.flatnonzero(codes >= 0)
+        codes = codes[positions]
+
+        # a stable sort keeps the positions of each group in ascending order
+        order = np.argsort(codes, kind='mergesort')
+        positions = positions[order]
+
+        counts = np.bincount(codes, minlength=len(uniques))
+        offsets = np.zeros(len(uniques) + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+        return cls(pd.Index(uniques), positions, offsets)
+
+    def extend(self, values, start):
+        """Add rows to the index without rebuilding it
+
+        Existing rows keep their positions, and the new rows are added after
+        them in every group, so each group stays in ascending order as long
+        as the new rows are positioned after all existing rows.
+
+        Args:
+            values (np.ndarray, pd.Series) : values of the new rows
+            start (int) : position of the first new row in the dataframe
+        """
+        codes, uniques = factorize(values)
+        unique_slots, keys = self._add_keys(uniques)
+
+        positions = np.flatnonzero(codes >= 0)
+        slots = unique_slots[codes[positions]]
+        order = np.argsort(slots, kind='mergesort')
+        slots = slots[order]
+        positions = positions[order] + start
+
+        old_counts = np.zeros(len(keys), dtype=np.int64)
+        old_counts[:len(self.keys)] = np.diff(self.offsets)
+        new_counts = np.bincount(slots, minlength=len(keys))
+        offsets = np.zeros(len(keys) + 1, dtype=np.int64)
+        np.cumsum(old_counts + new_counts, out=offsets[1:])
+
+        # existing rows move over by the number of new rows in earlier groups
+        merged = np.empty(offsets[-1], dtype=np.int64)
+        shift = offsets[:len(self.keys)] - self.offsets[:-1]
+        old_locations = np.arange(len(self.positions), dtype=np.int64)
+        old_locations += np.repeat(shift, old_counts[:len(self.keys)])
+        merged[old_locations] = self.positions
+
+        # new rows go at the end of their group
+        rank = np.arange(len(slots)) - (np.cumsum(new_counts) - new_counts)[slots]
+        merged[offsets[slots + 1] - new_counts[slots] + rank] = positions
+
+        self.keys = keys
+        self.positions = merged
+        self.offsets = offsets
+
+    def insert(self, values, positions, old_positions):
+        """Add rows which are inserted in between existing rows
+
+        Args:
+            values (np.ndarray, pd.Series) : values of the new rows
+            positions (np.ndarray) : positions of the new rows in the
+                dataframe once they are inserted
+            old_positions (np.ndarray) : position each existing row is moved
+                to, by its current position. Existing rows have to stay in
+                the same order.
+        """
+        codes, uniques = factorize(values)
+        unique_slots, keys = self._add_keys(uniques)
+
+        valid = np.flatnonzero(codes >= 0)
+        slots = unique_slots[codes[valid]]
+        positions = np.asarray(positions)[valid]
+        order = np.lexsort((positions, slots))
+        slots = slots[order]
+        positions = positions[order]
+
+        old_counts = np.diff(self.offsets)
+        old_slots = np.repeat(np.arange(len(self.keys)), old_counts)
+        moved = old_positions[self.positions]
+
+        # both sets of rows are sorted by slot and then by position, so the
+        # new rows are merged in by searching for them among the old ones
+        stride = len(old_positions) + len(values)
+        at = np.searchsorted(old_slots * stride + moved,
+                             slots * stride + positions)
+        at += np.arange(len(slots))
+        merged = np.empty(len(moved) + len(slots), dtype=np.int64)
+        is_new = np.zeros(len(merged), dtype=bool)
+        is_new[at] = True
+        merged[at] = positions
+        merged[~is_new] = moved
+
+        counts = np.bincount(slots, minlength=len(keys))
+        counts[:len(self.keys)] += old_counts
+        offsets = np.zeros(len(keys) + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+
+        self.keys = keys
+        self.positions = merged
+        self.offsets = offsets
+
+    def _add_keys(self, uniques):
+        """
+        Find the slots of unique values, giving new slots at the end to the
+        values which are not keys yet. Returns the slots and the new keys.
+        """
+        unique_slots = self.keys.get_indexer(uniques)
+        unseen = unique_slots < 0
+        unique_slots[unseen] = len(self.keys) + np.arange(unseen.sum())
+        keys = self.keys.append(pd.Index(np.asarray(uniques)[unseen]))
+        return unique_slots, keys
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __contains__(self, value):
+        return value in self.keys
+
+    def __getitem__(self, value):
+        slot = self.keys.get_loc(value)
+        return self.positions[self.offsets[slot]:self.offsets[slot + 1]]
+
+    def get_slots(self, values):
+        """Return the slots of values in the index, dropping missing values"""
+        slots = get_key_positions(self.keys, values)
+        return slots[slots >= 0]
+
+    def get_positions(self, values):
+        """Return the row positions of all rows matching any of values
+
+        Rows are returned grouped in the order values are passed in.
+
+        Args:
+            values (np.ndarray, pd.Series, list) : values to look up. Values
+                which are not in the index are ignored.
+
+        Returns:
+            np.ndarray : row positions
+        """
+        slots = self.get_slots(values)
+        return gather_segments(self.positions,
+                               self.offsets[slots],
+                               self.offsets[slots + 1])
+
+
+def factorize(values):
+    """
+    Encode values as integer codes into an array of unique values, with null
+    values encoded as -1. Categorical values already are encoded this way, so
+    their codes are used directly.
+    """
+    if is_categorical_dtype(values):
+        values = pd.Categorical(values)
+        return values.codes.astype(np.int64), values.categories
+    codes, uniques = pd.factorize(values)
+    return codes.astype(np.int64, copy=False), uniques
+
+
+def get_key_positions(keys, values):
+    """
+    Find the position of each of values in an array of unique keys, or -1 if
+    it is not one of the keys. Categorical values are looked up once per
+    category and mapped to rows through their integer codes.
+    """
+    keys = pd.Index(keys)
+    if is_categorical_dtype(values):
+        values = pd.Categorical(values)
+        category_positions = np.append(keys.get_indexer(values.categories), -1)
+        # null values have a code of -1, which takes the appended -1
+        return category_positions.take(values.codes)
+    return keys.get_indexer(values)
+
+
+def gather_segments(array, starts, ends):
+    """Concatenate array[starts[i]:ends[i]] for all i without a python loop"""
+    lengths = ends - starts
+    total = lengths.sum()
+    if total == 0:
+        return array[:0]
+
+    # each output element is at (start of its segment) + (rank within segment)
+    segment_starts = np.cumsum(lengths) - lengths
+    take = np.arange(total, dtype=np.int64)
+    take += np.repeat(starts - segment_starts, lengths)
+    return array[take]
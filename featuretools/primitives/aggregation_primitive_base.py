@@ -1,5 +1,8 @@
 import functools
 
+import numpy as np
+import pandas as pd
+
 from .primitive_base import PrimitiveBase
 from .utils import inspect_function_args
 
@@ -44,6 +47,16 @@ class AggregationPrimitive(PrimitiveBase):
         super(AggregationPrimitive, self).__init__(parent_entity,
                                                    self.base_features)
 
+    def get_grouped_function(self):
+        """Function calculating the feature for every group at once
+
+        The function is called with an array of the key of each row's group,
+        followed by the base features, and returns a pd.Series of the feature
+        values indexed by key. When it is not None, the backend calls it
+        instead of calling the function from get_function once per group.
+        """
+        return None
+
     def _where_str(self):
         if self.where is not None:
             where_str = u" WHERE " + self.where.get_name()
@@ -79,7 +92,7 @@ def make_agg_primitive(function, input_types, return_type, name=None,
                        stack_on_exclude=None, base_of=None,
                        base_of_exclude=None, description='A custom primitive',
                        cls_attributes=None, uses_calc_time=False,
-                       associative=False):
+                       associative=False, grouped_function=None):
     '''Returns a new aggregation primitive class
 
     Args:
@@ -118,6 +131,13 @@ def make_agg_primitive(function, input_types, return_type, name=None,
         associative (bool): If True, will only make one feature per unique set
             of base features
 
+        grouped_function (function, optional): function that calculates the
+            primitive for every group at once. It takes an array of the
+            integer code of each value's group, from 0 to the number of groups
+            minus one, followed by the same inputs as `function`, and returns
+            an array with the value of each group, by code. If provided, it is
+            used instead of calling `function` once per group.
+
     Example:
         .. ipython :: python
 
@@ -193,6 +213,12 @@ def make_agg_primitive(function, input_types, return_type, name=None,
         # creates a lambda function that returns function every time
         new_class.get_function = lambda self, f=function: f
 
+    if grouped_function is not None:
+        def get_grouped_function(self):
+            kwargs = getattr(self, 'kwargs', {})
+            return _call_with_group_codes(grouped_function, kwargs)
+        new_class.get_grouped_function = get_grouped_function
+
     # infers default_value by passing empty data
     try:
         new_class.default_value = function(*[[]] * len(input_types))
@@ -200,3 +226,20 @@ def make_agg_primitive(function, input_types, return_type, name=None,
         pass
 
     return new_class
+
+
+def _call_with_group_codes(grouped_function, kwargs):
+    """
+    Wrap the grouped function of a custom primitive, which takes the codes of
+    the groups, to take their keys like get_grouped_function does. Values
+    without a group are dropped.
+    """
+    def grouped(group_keys, *args, **time):
+        codes, keys = pd.factorize(group_keys)
+        has_group = codes >= 0
+        if not has_group.all():
+            codes = codes[has_group]
+            args = [arg[has_group] for arg in args]
+        values = grouped_function(codes, *args, **dict(kwargs, **time))
+        return pd.Series(np.asarray(values), index=keys)
+    return grouped
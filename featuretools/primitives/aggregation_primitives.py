@@ -2,6 +2,7 @@ from datetime import datetime, timedelta
 
 import numpy as np
 import pandas as pd
+from pandas.api.types import is_categorical_dtype
 from scipy.stats import skew
 
 from .aggregation_primitive_base import (
@@ -91,6 +92,13 @@ class Mode(AggregationPrimitive):
             return x.mode().iloc[0]
         return pd_mode
 
+    def get_grouped_function(self):
+        def pd_grouped_mode(groups, x):
+            # ties go to the smallest value, like Series.mode
+            keys, _, values = _find_most_common(groups, x, 1)
+            return pd.Series(values, index=keys)
+        return pd_grouped_mode
+
 
 Min = make_agg_primitive(
     np.min,
@@ -196,9 +204,25 @@ class NMostCommon(AggregationPrimitive):
 
     def get_function(self):
         def pd_topn(x, n=self.n):
-            return np.array(x.value_counts()[:n].index)
+            # ties go to the smallest value, and categories which do not
+            # occur are not counted
+            counts = x.value_counts(sort=False).sort_index()
+            counts = counts[counts > 0]
+            order = np.argsort(-counts.values, kind='mergesort')
+            return np.array(counts.index[order[:n]])
         return pd_topn
 
+    def get_grouped_function(self):
+        def pd_grouped_topn(groups, x, n=self.n):
+            keys, group_codes, values = _find_most_common(groups, x, n)
+            starts = np.flatnonzero(group_codes[1:] != group_codes[:-1]) + 1
+            topn = np.empty(len(keys), dtype=object)
+            if len(keys):
+                for i, group_values in enumerate(np.split(values, starts)):
+                    topn[i] = group_values
+            return pd.Series(topn, index=keys)
+        return pd_grouped_topn
+
 
 class AvgTimeBetween(AggregationPrimitive):
     """Computes the average time between consecutive events
@@ -259,6 +283,12 @@ class Median(AggregationPrimitive):
     def get_function(self):
         return np.median
 
+    def get_grouped_function(self):
+        def pd_grouped_median(groups, x):
+            # like np.median, null values make the median null
+            return _get_grouped_quantile(groups, x, .5)
+        return pd_grouped_median
+
 
 class Skew(AggregationPrimitive):
     """Computes the skewness of a data set.
@@ -277,6 +307,16 @@ class Skew(AggregationPrimitive):
     def get_function(self):
         return skew
 
+    def get_grouped_function(self):
+        def pd_grouped_skew(groups, x):
+            # like scipy.stats.skew, null values make the skew null
+            keys, m2, m3 = _get_central_moments(groups, x, dropna=False)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                skews = m3 / m2 ** 1.5
+            skews[m2 == 0] = 0
+            return pd.Series(skews, index=keys)
+        return pd_grouped_skew
+
 
 class Std(AggregationPrimitive):
     """
@@ -291,6 +331,13 @@ class Std(AggregationPrimitive):
     def get_function(self):
         return np.nanstd
 
+    def get_grouped_function(self):
+        def pd_grouped_std(groups, x):
+            # like np.nanstd, null values are ignored and ddof is 0
+            keys, m2, _ = _get_central_moments(groups, x, dropna=True)
+            return pd.Series(np.sqrt(m2), index=keys)
+        return pd_grouped_std
+
 
 class Last(AggregationPrimitive):
     """Returns the last value"""
@@ -305,6 +352,13 @@ class Last(AggregationPrimitive):
             return x.iloc[-1]
         return pd_last
 
+    def get_grouped_function(self):
+        def pd_grouped_last(groups, x):
+            keys, rows, starts, counts = _sort_groups(groups)
+            last_rows = rows[starts + counts - 1]
+            return pd.Series(x.take(last_rows).values, index=keys)
+        return pd_grouped_last
+
 
 class Any(AggregationPrimitive):
     """Test if any value is 'True'"""
@@ -343,6 +397,14 @@ class TimeSinceLast(AggregationPrimitive):
 
         return time_since_last
 
+    def get_grouped_function(self):
+        def pd_grouped_time_since_last(groups, values, time=None):
+            keys, rows, starts, _ = _sort_groups(groups)
+            first_times = pd.DatetimeIndex(values.values.take(rows[starts]))
+            time_since = (time - first_times).total_seconds()
+            return pd.Series(time_since, index=keys)
+        return pd_grouped_time_since_last
+
 
 class Trend(AggregationPrimitive):
     """Calculates the slope of the linear trend of variable overtime"""
@@ -387,6 +449,36 @@ class Trend(AggregationPrimitive):
             return coefficients[0]
         return pd_trend
 
+    def get_grouped_function(self):
+        def pd_grouped_trend(groups, y, x):
+            # the slope of the least squares line is cov(x, y) / var(x),
+            # which is a ratio of sums over each group
+            codes, uniques = pd.factorize(groups)
+            valid = (codes >= 0) & pd.notnull(x.values) & pd.notnull(y.values)
+            codes = codes[valid]
+            num_groups = len(uniques)
+            if not len(codes):
+                return pd.Series(np.nan, index=uniques)
+            x = _convert_times_to_floats(x.values[valid], codes, num_groups)
+            y = _convert_times_to_floats(y.values[valid], codes, num_groups)
+
+            counts = np.bincount(codes, minlength=num_groups)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                x_mean = np.bincount(codes, x, num_groups) / counts
+                y_mean = np.bincount(codes, y, num_groups) / counts
+                x = x - x_mean[codes]
+                y = y - y_mean[codes]
+                slopes = np.bincount(codes, x * y, num_groups) / \
+                    np.bincount(codes, x * x, num_groups)
+
+            # prevent divide by zero error
+            grouped = pd.Series(x).groupby(codes)
+            is_constant = (grouped.max() == grouped.min()).values
+            slopes[np.unique(codes)[is_constant]] = 0
+            slopes[counts <= 2] = np.nan
+            return pd.Series(slopes, index=uniques)
+        return pd_grouped_trend
+
 
 # # TODO: Not implemented yet
 # class ConseqPos(AggregationPrimitive):
@@ -436,6 +528,159 @@ def convert_timedelta_to_floats(x):
     return x
 
 
+def _sort_groups(groups, x=None):
+    """
+    Sort rows by group, and by value within each group if x is given, so that
+    the rows of each group form a segment. Without x, the rows of each group
+    keep their order. Rows with a null group are dropped, and null values of
+    x sort last in their segment.
+
+    Returns:
+        (pd.Index, np.ndarray, np.ndarray, np.ndarray): keys of the groups,
+            positions of the rows in sorted order, and the start and length
+            of each group's segment
+    """
+    codes, keys = pd.factorize(groups)
+    if x is None:
+        rows = np.argsort(codes, kind='mergesort')
+    else:
+        rows = np.lexsort((x, codes))
+    # null groups have a code of -1, so sort first
+    rows = rows[np.searchsorted(codes[rows], 0):]
+    counts = np.bincount(codes[rows], minlength=len(keys))
+    starts = np.cumsum(counts) - counts
+    return keys, rows, starts, counts
+
+
+def _get_grouped_quantile(groups, x, q):
+    """
+    Compute the q-th quantile of the values of each group, interpolating
+    linearly between the closest values like np.percentile. Groups with null
+    values get a null quantile.
+    """
+    values = x.values.astype(np.float64)
+    keys, rows, starts, counts = _sort_groups(groups, values)
+    values = values[rows]
+
+    position = (counts - 1) * q
+    below = np.floor(position).astype(np.int64)
+    above = np.ceil(position).astype(np.int64)
+    weight = position - below
+    quantiles = values[starts + below] * (1 - weight) + \
+        values[starts + above] * weight
+
+    # nulls sort last, so a group with any nulls has one last
+    has_null = np.isnan(values[starts + counts - 1])
+    quantiles[has_null] = np.nan
+    return pd.Series(quantiles, index=keys)
+
+
+def _get_central_moments(groups, x, dropna):
+    """
+    Compute the second and third central moments of the values of each group,
+    by summing over the groups once for the means and once for the powers of
+    the deviations from them. Null values are dropped if dropna, and
+    otherwise make the moments of their group null. Groups of a single
+    repeated value get moments of exactly 0, whatever the rounding of the
+    mean.
+
+    Returns:
+        (pd.Index, np.ndarray, np.ndarray): keys of the groups, and their
+            second and third moments
+    """
+    codes, keys = pd.factorize(groups)
+    x = x.values.astype(np.float64)
+    valid = codes >= 0
+    if dropna:
+        valid &= ~np.isnan(x)
+    codes = codes[valid]
+    x = x[valid]
+    num_groups = len(keys)
+
+    # bincount gives integers when there are no rows
+    counts = np.bincount(codes, minlength=num_groups).astype(np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        means = np.bincount(codes, x, num_groups) / counts
+        deviations = x - means[codes]
+        squares = deviations * deviations
+        m2 = np.bincount(codes, squares, num_groups) / counts
+        m3 = np.bincount(codes, squares * deviations, num_groups) / counts
+
+    extremes = pd.Series(x).groupby(codes).agg(['min', 'max'])
+    is_constant = (extremes['min'] == extremes['max']).values
+    constant = extremes.index.values[is_constant]
+    constant = constant[~np.isnan(m2[constant])]
+    m2[constant] = 0
+    m3[constant] = 0
+    return keys, m2, m3
+
+
+def _find_most_common(groups, x, n):
+    """
+    Find the n most common non-null values of each group from a single count
+    of every (group, value) pair. Ties go to the smallest value.
+
+    Returns:
+        (pd.Index, np.ndarray, np.ndarray): the keys of groups with any
+            values, and the group code and value of each group's most common
+            values, sorted by group and then from most to least common
+    """
+    group_codes, group_keys = pd.factorize(groups)
+    if is_categorical_dtype(x):
+        value_codes = x.cat.codes.values
+        value_uniques = x.cat.categories
+    else:
+        value_codes, value_uniques = pd.factorize(x.values, sort=True)
+    valid = (group_codes >= 0) & (value_codes >= 0)
+    pairs = pd.DataFrame({'group': group_codes[valid],
+                          'value': value_codes[valid]})
+
+    counts = pairs.groupby(['group', 'value']).size()
+    pair_groups = counts.index.get_level_values(0).values
+    pair_values = counts.index.get_level_values(1).values
+
+    order = np.lexsort((pair_values, -counts.values, pair_groups))
+    pair_groups = pair_groups[order]
+    pair_values = pair_values[order]
+    is_start = np.ones(len(order), dtype=bool)
+    is_start[1:] = pair_groups[1:] != pair_groups[:-1]
+    starts = np.maximum.accumulate(np.where(is_start, np.arange(len(order)),
+                                            0)) if len(order) else order
+    ranks = np.arange(len(order)) - starts
+    keep = ranks < n
+
+    keys = group_keys.take(pair_groups[is_start])
+    values = np.asarray(value_uniques).take(pair_values[keep])
+    return keys, pair_groups[keep], values
+
+
+def _convert_times_to_floats(values, codes, num_groups):
+    """
+    Convert datetime and timedelta values to floats like
+    convert_datetime_to_floats and convert_timedelta_to_floats, choosing the
+    unit of each group from its first value. Other values are cast to floats.
+    """
+    if values.dtype.kind not in 'mM':
+        return values.astype(np.float64)
+
+    if values.dtype.kind == 'M':
+        nanoseconds = values.astype('datetime64[ns]').view(np.int64)
+    else:
+        nanoseconds = values.astype('timedelta64[ns]').view(np.int64)
+    floats = nanoseconds.astype(np.float64)
+    _, first_rows = np.unique(codes, return_index=True)
+    first = np.trunc(floats[first_rows] * 1e-9)
+    dividends = np.ones(num_groups)
+    group_dividends = np.ones(len(first))
+    # a larger dividend replaces the smaller ones dividing it
+    for dividend in [60., 3600., 86400.]:
+        group_dividends[np.fmod(first, dividend) == 0] = dividend
+    dividends[codes[first_rows]] = group_dividends
+    if values.dtype.kind == 'M':
+        return floats * (1e-9 / dividends[codes])
+    return floats * 1e-9 / dividends[codes]
+
+
 def find_dividend_by_unit(time):
     """
     Finds whether time best corresponds to a value in
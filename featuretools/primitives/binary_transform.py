@@ -15,8 +15,30 @@ from featuretools.variable_types import (
     Variable
 )
 
+# ufuncs which calculate the operator methods of pandas series on numeric
+# arrays, and whether they take the operands in reverse order
+_ufuncs = {
+    "__add__": (np.add, False),
+    "__radd__": (np.add, True),
+    "__sub__": (np.subtract, False),
+    "__rsub__": (np.subtract, True),
+    "__mul__": (np.multiply, False),
+    "__rmul__": (np.multiply, True),
+    "__div__": (np.true_divide, False),
+    "__rdiv__": (np.true_divide, True),
+    "__mod__": (np.mod, False),
+    "__rmod__": (np.mod, True),
+    "__eq__": (np.equal, False),
+    "__ne__": (np.not_equal, False),
+    "__lt__": (np.less, False),
+    "__gt__": (np.greater, False),
+    "__le__": (np.less_equal, False),
+    "__ge__": (np.greater_equal, False),
+}
+
 
 class BinaryFeature(TransformPrimitive):
+    elementwise = True
 
     def __init__(self, left, right):
         if isinstance(left, (PrimitiveBase, Variable)):
@@ -104,6 +126,25 @@ class BinaryFeature(TransformPrimitive):
     def pd_binary(self, array_1, array_2=None):
         return apply_dual_op_from_feat(self, array_1, array_2).values
 
+    def get_ufunc(self):
+        # the operator is applied like in apply_dual_op_from_feat, on the
+        # left feature if there is one
+        if isinstance(self.left, PrimitiveBase):
+            to_op, other, op = self.left, self.right, self._get_op()
+        else:
+            to_op, other, op = self.right, self.left, self._get_rop()
+        if not isinstance(other, PrimitiveBase) and not _is_number(other):
+            return None
+        ufunc, reverse = _ufuncs[op]
+        if reverse:
+            return ufunc, [other, to_op]
+        return ufunc, [to_op, other]
+
+
+def _is_number(value):
+    return (isinstance(value, (int, long, float, np.integer, np.floating)) and
+            not isinstance(value, np.timedelta64))
+
 
 class ArithmeticFeature(BinaryFeature):
     _ADD = '+'
@@ -317,10 +358,14 @@ class And(TransformPrimitive):
     input_types = [Boolean, Boolean]
     return_type = Boolean
     associative = True
+    elementwise = True
 
     def get_function(self):
         return lambda left, right: np.logical_and(left, right)
 
+    def get_ufunc(self):
+        return np.logical_and, self.base_features
+
 
 class Or(TransformPrimitive):
     """For two boolean values, determine if one value is 'True'"""
@@ -328,6 +373,10 @@ class Or(TransformPrimitive):
     input_types = [Boolean, Boolean]
     return_type = Boolean
     associative = True
+    elementwise = True
 
     def get_function(self):
         return lambda left, right: np.logical_or(left, right)
+
+    def get_ufunc(self):
+        return np.logical_or, self.base_features
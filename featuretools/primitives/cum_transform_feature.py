@@ -1,5 +1,3 @@
-import uuid
-
 import numpy as np
 import pandas as pd
 
@@ -164,110 +162,143 @@ def pd_rolling_outer(rolling_func, f):
 
         df = pd.DataFrame.from_dict(df_dict)
 
-        if f.use_previous and not f.where:
-            def apply_rolling(group):
-                to_roll = group
-                kwargs = {'window': timedelta,
-                          'min_periods': 1}
-                if absolute:
-                    to_roll = to_roll[[bf_name, time_index]].sort_values(time_index, kind='mergesort')
-                    kwargs['on'] = time_index
-                else:
-                    to_roll = to_roll[bf_name]
-                rolled = to_roll.rolling(**kwargs)
-                rolled = getattr(rolled, rolling_func)()
-                if absolute:
-                    rolled = rolled[bf_name]
-                return rolled
-        elif not f.where:
-            cumfuncs = {"count": "cumcount",
-                        "sum": "cumsum",
-                        "max": "cummax",
-                        "min": "cummin",
-                        "prod": "cumprod",
-                        }
-            if rolling_func in ["count", "sum", "max", "min"]:
-                cumfunc = cumfuncs[rolling_func]
-                grouped = df.groupby(groupby, sort=False)[bf_name]
-                applied = getattr(grouped, cumfunc)()
-                # TODO: to produce same functionality as the rolling cases already
-                # implemented, we add 1
-                # We may want to consider changing this functionality to instead
-                # return count of the *previous* events
-                if rolling_func == "count":
-                    applied += 1
-                return applied
-            else:
-                def apply_rolling(group):
-                    rolled = group[bf_name].expanding(min_periods=1)
-                    return getattr(rolled, rolling_func)()
-        elif f.use_previous and f.where:
-            def apply_rolling(group):
-                variable_data = [group[base.get_name()]
-                                 for base in [f.where.left, f.where.right]
-                                 if isinstance(base, PrimitiveBase)]
-                mask = apply_dual_op_from_feat(f.where, *variable_data)
-                to_roll = group[mask]
-                kwargs = {'window': timedelta,
-                          'min_periods': 1}
-                if absolute:
-                    output = pd.Series(f.default_value, index=group.index)
-                    # mergesort is stable
-                    to_roll = to_roll[[bf_name, time_index]].sort_values(time_index, kind='mergesort')
-                    kwargs['on'] = time_index
-                else:
-                    output = pd.Series(np.nan, index=group.index)
-                    to_roll = to_roll[bf_name]
-                rolled = to_roll.rolling(**kwargs)
-                rolled = getattr(rolled, rolling_func)()
-                if absolute:
-                    rolled = rolled[bf_name]
-                    output[mask] = rolled
-                else:
-                    output[mask] = rolled
-                    # values filtered out by the Where statement
-                    # should have their values be w
-                    output.fillna(method='ffill', inplace=True)
-                    # first value might still be nan
-                    if pd.isnull(output.iloc[0]):
-                        output.fillna(0, inplace=True)
-                return output
-        elif f.where:
-            def apply_rolling(group):
-                variable_data = [group[base.get_name()]
-                                 for base in [f.where.left, f.where.right]
-                                 if isinstance(base, PrimitiveBase)]
-                mask = apply_dual_op_from_feat(f.where, *variable_data)
-                output = pd.Series(np.nan, index=group.index)
-                rolled = group[mask][bf_name].expanding(min_periods=1)
-                rolled = getattr(rolled, rolling_func)()
-                output[mask] = rolled
-                # values filtered out by the Where statement
-                # should have their values be w
-                output.fillna(method='ffill', inplace=True)
-                # first value might still be nan
-                if pd.isnull(output.iloc[0]):
-                    output.fillna(0, inplace=True)
-                return output
-
-        new_index_name = str(uuid.uuid1())
-        new_index = pd.RangeIndex(len(df), name=new_index_name)
-        df.set_index(new_index, append=True, inplace=True)
-        grouped = df.groupby(groupby).apply(apply_rolling)
-        original_index = pd.Series(np.nan, index=df.index)
-        if isinstance(grouped, pd.DataFrame):
-            if grouped.shape[0] == 0 or grouped.empty:
-                return original_index.values
+        cumfuncs = {"count": "cumcount",
+                    "sum": "cumsum",
+                    "max": "cummax",
+                    "min": "cummin",
+                    }
+        if not f.use_previous and not f.where and rolling_func in cumfuncs:
+            cumfunc = cumfuncs[rolling_func]
+            grouped = df.groupby(groupby, sort=False)[bf_name]
+            applied = getattr(grouped, cumfunc)()
+            # TODO: to produce same functionality as the rolling cases already
+            # implemented, we add 1
+            # We may want to consider changing this functionality to instead
+            # return count of the *previous* events
+            if rolling_func == "count":
+                applied += 1
+            return applied
+
+        # rows are sorted by group, and by time within each group if the
+        # window is a length of time, so that each window is a contiguous
+        # run of rows. Rows with a null group keep a null value
+        output = np.full(len(df), np.nan)
+        codes, _ = pd.factorize(group_array)
+        rows = np.flatnonzero(codes >= 0)
+        absolute_window = f.use_previous is not None and absolute
+        if absolute_window:
+            times = np.asarray(values_3).astype(np.int64)
+            order = rows[np.lexsort((times[rows], codes[rows]))]
+        else:
+            order = rows[np.argsort(codes[rows], kind='mergesort')]
+
+        selected = order
+        if f.where:
+            variable_data = [df[base.get_name()]
+                             for base in [f.where.left, f.where.right]
+                             if isinstance(base, PrimitiveBase)]
+            mask = np.asarray(apply_dual_op_from_feat(f.where, *variable_data),
+                              dtype=bool)
+            selected = order[mask[order]]
+
+        sorted_codes = codes[selected]
+        group_starts = _get_group_starts(sorted_codes)
+        if f.use_previous is None:
+            starts = group_starts
+        elif absolute:
+            starts = _get_time_window_starts(sorted_codes, times[selected],
+                                             timedelta.value)
+        else:
+            starts = np.maximum(np.arange(len(selected)) - int(timedelta) + 1,
+                                group_starts)
+        output[selected] = _rolling_reduce(rolling_func,
+                                           np.asarray(base_array)[selected],
+                                           sorted_codes, starts, group_starts)
+
+        if f.where:
+            if absolute_window:
+                output[order[~mask[order]]] = f.default_value
             else:
-                grouped = pd.Series(grouped.values[0], index=grouped.columns)
-
-        df.reset_index(new_index_name, inplace=True, drop=True)
-        # case where some values of df[groupby] are nan
-        # pandas groupby().apply() filters those out
-        # and returns a series that's shorter than the original
-        # we need to add these values to the original index to
-        # preserve the length and these nan values
-        grouped_index = grouped.index.get_level_values(new_index_name)
-        original_index[grouped_index] = grouped.values
-        return original_index.values
+                # rows filtered out by the where clause take the value of the
+                # previous row in their group, or 0 if there is none
+                filled = pd.Series(output[order]).groupby(codes[order]).ffill()
+                output[order] = filled.fillna(0).values
+        return output
     return pd_rolling
+
+
+def _get_group_starts(codes):
+    """For codes sorted by group, the position where each row's group starts"""
+    is_start = np.ones(len(codes), dtype=bool)
+    is_start[1:] = codes[1:] != codes[:-1]
+    starts = np.where(is_start, np.arange(len(codes)), 0)
+    return np.maximum.accumulate(starts) if len(codes) else starts
+
+
+def _get_time_window_starts(codes, times, window):
+    """
+    For rows sorted by group and then time, find the first row of each row's
+    group which is less than window before it, like a time-based rolling
+    window does. Every row and every row's window start are sorted together,
+    and the position of each window start among the rows is its first row.
+    """
+    n = len(codes)
+    is_start = np.repeat([0, 1], n)
+    order = np.lexsort((is_start,
+                        np.concatenate([times, times - window]),
+                        np.concatenate([codes, codes])))
+    ranks = np.empty(2 * n, dtype=np.int64)
+    ranks[order] = np.arange(2 * n)
+    # window starts are sorted in the same order as their rows, so the i-th
+    # window start comes after i other window starts
+    return ranks[n:] - np.arange(n)
+
+
+def _rolling_reduce(rolling_func, values, codes, starts, group_starts):
+    """
+    Apply a rolling function over windows of rows, from starts to each row,
+    of rows sorted by group. Null values are skipped, and windows without a
+    value are null, except for counts.
+    """
+    notnull = pd.notnull(values)
+    counts = np.cumsum(notnull)
+    count = counts - np.where(starts > 0, counts[starts - 1], 0)
+    if rolling_func == 'count':
+        return count
+
+    values = values.astype(np.float64)
+    if rolling_func in ('sum', 'mean'):
+        # sums restart with each group to limit rounding errors
+        sums = pd.Series(np.where(notnull, values, 0)).groupby(codes).cumsum()
+        sums = sums.values
+        result = sums - np.where(starts > group_starts, sums[starts - 1], 0)
+        if rolling_func == 'mean':
+            result = result / np.maximum(count, 1)
+    else:
+        func = np.fmax if rolling_func == 'max' else np.fmin
+        result = _window_extreme(values, starts, func)
+    result[count == 0] = np.nan
+    return result
+
+
+def _window_extreme(values, starts, func):
+    """
+    Take the max or min of values over the window from starts[i] to i for
+    each i, by splitting each window into blocks with power of two lengths.
+    At step k, level[j] holds the result over the block of 2 ** k values
+    starting at j.
+    """
+    n = len(values)
+    lengths = np.arange(n) - starts + 1
+    result = np.full(n, np.nan)
+    positions = starts.copy()
+    level = values
+    step = 1
+    while n and step <= lengths.max():
+        take = (lengths & step) > 0
+        result[take] = func(result[take], level[positions[take]])
+        positions[take] += step
+        level = np.concatenate([func(level[:-step], level[step:]),
+                                level[n - step:]])
+        step *= 2
+    return result
@@ -30,6 +30,12 @@ class TransformPrimitive(PrimitiveBase):
     """Feature for entity that is a based off one or more other features
         in that entity"""
     rolling_function = False
+    # whether each value only depends on the same row of the base features,
+    # so that the feature does not depend on which rows are calculated
+    elementwise = False
+    # calendar unit of a Datetime base feature which the feature is computed
+    # from, using the function from get_calendar_function
+    calendar_unit = None
 
     def __init__(self, *base_features):
         # Any edits made to this method should also be made to the
@@ -52,6 +58,14 @@ class TransformPrimitive(PrimitiveBase):
     def default_value(self):
         return self.base_features[0].default_value
 
+    def get_ufunc(self):
+        """
+        Get a ufunc which calculates the feature from numeric arrays of its
+        base features, and the operands it takes, which are base features or
+        numbers. If None, the feature is calculated with get_function
+        """
+        return None
+
 
 def make_trans_primitive(function, input_types, return_type, name=None,
                          description='A custom transform primitive',
@@ -148,6 +162,7 @@ class IsNull(TransformPrimitive):
     name = "is_null"
     input_types = [Variable]
     return_type = Boolean
+    elementwise = True
 
     def get_function(self):
         return lambda array: pd.isnull(pd.Series(array))
@@ -158,6 +173,7 @@ class Absolute(TransformPrimitive):
     name = "absolute"
     input_types = [Numeric]
     return_type = Numeric
+    elementwise = True
 
     def get_function(self):
         return lambda array: np.absolute(array)
@@ -190,25 +206,65 @@ class TimeSincePrevious(TransformPrimitive):
 
     def get_function(self):
         def pd_diff(base_array, group_array):
-            bf_name = 'base_feature'
-            groupby = 'groupby'
-            grouped_df = pd.DataFrame.from_dict({bf_name: base_array,
-                                                 groupby: group_array})
-            grouped_df = grouped_df.groupby(groupby).diff()
-            return grouped_df[bf_name].apply(lambda x:
-                                             x.total_seconds())
+            return _grouped_diff(base_array, group_array)
         return pd_diff
 
 
+def _grouped_diff(base_array, group_array):
+    """
+    Difference between each value and the previous value in its group, with
+    groups kept in row order. Datetimes are differenced as int64 nanoseconds
+    and returned in seconds. Rows which are first in their group, or which
+    have a null group or value, get NaN.
+    """
+    codes, _ = pd.factorize(group_array)
+    # a stable sort keeps each group's rows in their original order
+    order = np.argsort(codes, kind='mergesort')
+    sorted_codes = codes[order]
+
+    base_array = np.asarray(base_array)
+    is_datetime = base_array.dtype.kind == 'M'
+    if is_datetime:
+        base_array = base_array.astype('datetime64[ns]')
+        values = base_array.view(np.int64)[order]
+    else:
+        base_array = base_array.astype(np.float64)
+        values = base_array[order]
+    is_null = pd.isnull(base_array)[order] | (sorted_codes == -1)
+
+    diffs = np.full(len(values), np.nan)
+    if len(values) > 1:
+        diffs[1:] = values[1:] - values[:-1]
+        # the previous row must be in the same group and not null
+        is_valid = np.zeros(len(values), dtype=bool)
+        is_valid[1:] = (sorted_codes[1:] == sorted_codes[:-1]) & \
+            ~is_null[1:] & ~is_null[:-1]
+        diffs[~is_valid] = np.nan
+        if is_datetime:
+            diffs /= 1e9
+
+    output = np.empty(len(values))
+    output[order] = diffs
+    return output
+
+
 class DatetimeUnitBasePrimitive(TransformPrimitive):
     """Transform Datetime feature into time or calendar units
      (second/day/week/etc)"""
     name = None
     input_types = [Datetime]
     return_type = Ordinal
+    elementwise = True
+
+    @property
+    def calendar_unit(self):
+        return self.name
 
     def get_function(self):
-        return lambda array: pd_time_unit(self.name)(pd.DatetimeIndex(array))
+        return lambda array: pd_calendar_units(array, [self.name])[self.name]
+
+    def get_calendar_function(self):
+        return lambda values: values
 
 
 class TimedeltaUnitBasePrimitive(TransformPrimitive):
@@ -217,6 +273,7 @@ class TimedeltaUnitBasePrimitive(TransformPrimitive):
     name = None
     input_types = [Timedelta]
     return_type = Numeric
+    elementwise = True
 
     def get_function(self):
         return lambda array: pd_time_unit(self.name)(pd.TimedeltaIndex(array))
@@ -322,9 +379,18 @@ class Weekend(TransformPrimitive):
     name = "is_weekend"
     input_types = [Datetime]
     return_type = Boolean
+    elementwise = True
+
+    calendar_unit = "weekday"
 
     def get_function(self):
-        return lambda df: pd_time_unit("weekday")(pd.DatetimeIndex(df)) > 4
+        def pd_weekend(array):
+            weekday = pd_calendar_units(array, ["weekday"])["weekday"]
+            return self.get_calendar_function()(weekday)
+        return pd_weekend
+
+    def get_calendar_function(self):
+        return lambda weekday: weekday > 4
 
 
 class Weekday(DatetimeUnitBasePrimitive):
@@ -409,6 +475,7 @@ class IsIn(TransformPrimitive):
     name = "isin"
     input_types = [Variable]
     return_type = Boolean
+    elementwise = True
 
     def __init__(self, base_feature, list_of_outputs=None):
         self.list_of_outputs = list_of_outputs
@@ -456,15 +523,7 @@ class Diff(TransformPrimitive):
 
     def get_function(self):
         def pd_diff(base_array, group_array):
-            bf_name = 'base_feature'
-            groupby = 'groupby'
-            grouped_df = pd.DataFrame.from_dict({bf_name: base_array,
-                                                 groupby: group_array})
-            grouped_df = grouped_df.groupby(groupby).diff()
-            try:
-                return grouped_df[bf_name]
-            except KeyError:
-                return pd.Series([np.nan]*len(base_array))
+            return _grouped_diff(base_array, group_array)
         return pd_diff
 
 
@@ -475,6 +534,7 @@ class Not(TransformPrimitive):
     name = "not"
     input_types = [Boolean]
     return_type = Boolean
+    elementwise = True
 
     def _get_name(self):
         return u"NOT({})".format(self.base_features[0].get_name())
@@ -503,3 +563,125 @@ def pd_time_unit(time_unit):
     def inner(pd_index):
         return getattr(pd_index, time_unit).values
     return inner
+
+
+def pd_calendar_units(array, units):
+    """
+    Get several calendar units of datetimes, decoding them only once
+
+    The year, month, day, hour, minute, second, weekday and ISO week are
+    computed together from the int64 nanoseconds of the datetimes. Any other
+    unit is read from a pd.DatetimeIndex. Like the fields of a
+    pd.DatetimeIndex, units are floats with NaN for null datetimes if there
+    are any, and integers otherwise.
+
+    Args:
+        array (np.ndarray) : datetimes
+        units (list[str]) : names of pd.DatetimeIndex fields to compute
+
+    Returns:
+        dict[str -> np.ndarray] : values of each unit
+    """
+    index = pd.DatetimeIndex(array)
+    nanoseconds = index.asi8
+    is_null = nanoseconds == pd.NaT.value
+    days, time_of_day = np.divmod(nanoseconds, 86400 * 10 ** 9)
+    seconds = time_of_day // 10 ** 9
+
+    def get_weekday():
+        # 1970-01-01 was a Thursday
+        return (days + 3) % 7
+
+    computed = {}
+
+    def get_date():
+        if 'date' not in computed:
+            computed['date'] = _apply_to_days(_civil_from_days, days, is_null)
+        return computed['date']
+
+    def get_week():
+        return _apply_to_days(_iso_week_from_days, days, is_null)[0]
+
+    getters = {'year': lambda: get_date()[0],
+               'month': lambda: get_date()[1],
+               'day': lambda: get_date()[2],
+               'hour': lambda: seconds // 3600,
+               'minute': lambda: seconds // 60 % 60,
+               'second': lambda: seconds % 60,
+               'weekday': get_weekday,
+               'dayofweek': get_weekday,
+               'week': get_week,
+               'weekofyear': get_week}
+
+    has_nulls = is_null.any()
+    values = {}
+    for unit in units:
+        if unit not in getters:
+            values[unit] = pd_time_unit(unit)(index)
+            continue
+        unit_values = getters[unit]()
+        if has_nulls:
+            unit_values = unit_values.astype(np.float64)
+            unit_values[is_null] = np.nan
+        values[unit] = unit_values
+    return values
+
+
+def _apply_to_days(func, days, is_null):
+    """
+    Apply func, which maps days to a tuple of arrays, through a lookup table
+    of the days between the first and last day if there are fewer of them
+    than days. Null rows get arbitrary values.
+    """
+    if is_null.all():
+        return func(days)
+    first = days[~is_null].min()
+    last = days[~is_null].max()
+    if last - first >= len(days):
+        return func(days)
+    table = func(np.arange(first, last + 1))
+    positions = np.where(is_null, 0, days - first)
+    return tuple(values.take(positions) for values in table)
+
+
+def _iso_week_from_days(days):
+    """Get the ISO weeks of days since 1970-01-01"""
+    # the ISO week is the week of its Thursday's year, and the first week
+    # of a year has the year's first Thursday
+    thursday = days - (days + 3) % 7 + 3
+    iso_year = _civil_from_days(thursday)[0]
+    return ((thursday - _days_from_civil(iso_year)) // 7 + 1,)
+
+
+def _civil_from_days(days):
+    """Convert days since 1970-01-01 to proleptic Gregorian dates
+
+    Returns:
+        (np.ndarray, np.ndarray, np.ndarray) : years, months and days
+    """
+    # count from 0000-03-01, so leap days fall at the end of each year, and
+    # split into 400 year eras of 146097 days
+    days = days + 719468
+    era = days // 146097
+    day_of_era = days - era * 146097
+    year_of_era = (day_of_era - day_of_era // 1460 + day_of_era // 36524 -
+                   day_of_era // 146096) // 365
+    day_of_year = day_of_era - (365 * year_of_era + year_of_era // 4 -
+                                year_of_era // 100)
+    # months of 153 days per 5 starting in March
+    shifted_month = (5 * day_of_year + 2) // 153
+    day = day_of_year - (153 * shifted_month + 2) // 5 + 1
+    month = np.where(shifted_month < 10, shifted_month + 3, shifted_month - 9)
+    year = year_of_era + era * 400 + (month <= 2)
+    return year, month, day
+
+
+def _days_from_civil(year):
+    """Convert years to the days since 1970-01-01 of their January 1st"""
+    # January is in the year before, counting years from March
+    year = year - 1
+    era = year // 400
+    year_of_era = year - era * 400
+    day_of_era = year_of_era * 365 + year_of_era // 4 - \
+        year_of_era // 100 + 306
+    return era * 146097 + day_of_era - 719468
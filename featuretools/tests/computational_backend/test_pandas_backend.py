@@ -1,14 +1,17 @@
 from datetime import datetime
 
+import pandas as pd
 import pytest
 
 from ..testing_utils import make_ecommerce_entityset
 
-from featuretools import Timedelta
+from featuretools import EntitySet, Relationship, Timedelta
 from featuretools.computational_backends.pandas_backend import PandasBackend
 from featuretools.primitives import (
     And,
     Count,
+    Day,
+    Diff,
     DirectFeature,
     Equals,
     GreaterThan,
@@ -452,8 +455,9 @@ def test_topn(entityset, backend):
     df = pandas_backend.calculate_all_features(instance_ids=[0, 1, 2],
                                                time_last=None)
 
+    # ties go to the smallest value
     true_results = [
-        ['toothpaste', 'coke zero', 'brown bag'],
+        ['coke zero', 'toothpaste', 'brown bag'],
         ['coke zero', 'Haribo sugar-free gummy bears'],
         ['taco clock']
     ]
@@ -463,6 +467,64 @@ def test_topn(entityset, backend):
             assert (v == true_results[i][j])
 
 
+def test_mode_ties(entityset, backend):
+    mode = Mode(entityset['log']['product_id'], entityset['customers'])
+    pandas_backend = backend([mode])
+
+    df = pandas_backend.calculate_all_features(instance_ids=[0, 1, 2],
+                                               time_last=None)
+
+    # customer 0 has three each of coke zero and toothpaste
+    true_results = ['coke zero', 'coke zero', 'taco clock']
+    assert df[mode.get_name()].values.tolist() == true_results
+
+
+def test_n_most_common_ties(entityset, backend):
+    n_most_common = NMostCommon(entityset['log']['product_id'],
+                                entityset['sessions'], n=2)
+    pandas_backend = backend([n_most_common])
+
+    df = pandas_backend.calculate_all_features(instance_ids=range(6),
+                                               time_last=None)
+
+    # ties go to the smallest value, like in session 3, which has one row
+    # of each of its products
+    true_results = [['coke zero', 'car'],
+                    ['toothpaste', 'brown bag'],
+                    ['brown bag'],
+                    ['Haribo sugar-free gummy bears', 'coke zero'],
+                    ['coke zero'],
+                    ['taco clock']]
+    for session_id, true_values in enumerate(true_results):
+        values = df[n_most_common.get_name()][session_id]
+        assert list(values) == true_values
+
+
+def test_cutoff_independent_transforms_cached(entityset, backend):
+    log = entityset['log']
+    day = Day(log['datetime'])
+    value = IdentityFeature(log['value'])
+    doubled = value * 2 + 1
+    diff = Diff(value, log['session_id'])
+    pandas_backend = backend([day, doubled, diff])
+    log_df = log.df
+
+    # the first slice has fewer rows than the entity, so nothing is cached,
+    # but together with the second it covers them
+    for time_last in [datetime(2011, 4, 9, 10, 31), datetime(2012, 1, 1)]:
+        rows = log_df[log_df['datetime'] <= time_last]
+        df = pandas_backend.calculate_all_features(instance_ids=rows.index,
+                                                   time_last=time_last)
+        assert df[day.get_name()].tolist() == rows['datetime'].dt.day.tolist()
+        pd.testing.assert_series_equal(df[doubled.get_name()],
+                                       rows['value'] * 2 + 1,
+                                       check_names=False)
+
+    # value * 2 is calculated along with doubled, so is not cached
+    cached = pandas_backend._transform_cache['log']
+    assert set(cached) == set([day.get_name(), doubled.get_name()])
+
+
 def test_direct_squared(entityset, backend):
     feature = IdentityFeature(entityset['log']['value'])
     squared = feature * feature
@@ -471,3 +533,49 @@ def test_direct_squared(entityset, backend):
                                                time_last=None)
     for i, row in df.iterrows():
         assert (row[0] * row[0]) == row[1]
+
+
+def make_categorical_entityset(session_customers):
+    customers = pd.DataFrame({'id': pd.Categorical(['a', 'b', 'c']),
+                              'age': [30, 40, 50]})
+    categories = ['a', 'b', 'c', 'd']
+    sessions = pd.DataFrame({
+        'id': range(len(session_customers)),
+        'customer_id': pd.Categorical(session_customers,
+                                      categories=categories),
+        'value': range(len(session_customers))})
+    es = EntitySet(id='categorical')
+    es.entity_from_dataframe('customers', customers, index='id')
+    es.entity_from_dataframe('sessions', sessions, index='id')
+    es.add_relationship(Relationship(es['customers']['id'],
+                                     es['sessions']['customer_id']))
+    return es
+
+
+def test_categorical_link_variable():
+    es = make_categorical_entityset(['b', 'a', 'b', None, 'd'])
+    assert es['sessions'].df['customer_id'].dtype.name == 'category'
+    assert es['customers'].df['id'].dtype.name != 'category'
+
+    count = Count(es['sessions']['id'], parent_entity=es['customers'])
+    total = Sum(es['sessions']['value'], parent_entity=es['customers'])
+    age = DirectFeature(es['customers']['age'], child_entity=es['sessions'])
+    df = PandasBackend(es, [count, total]).calculate_all_features(
+        instance_ids=['a', 'b', 'c'], time_last=None)
+    assert df[count.get_name()].tolist() == [1, 2, 0]
+    assert df[total.get_name()][:2].tolist() == [1, 2]
+    assert pd.isnull(df[total.get_name()][2])
+
+    df = PandasBackend(es, [age]).calculate_all_features(
+        instance_ids=range(5), time_last=None)
+    ages = df[age.get_name()]
+    assert ages[:3].tolist() == [40, 30, 40]
+    assert ages[3:].isnull().all()
+
+
+def test_categorical_link_variable_no_related_instances():
+    es = make_categorical_entityset(['d', None])
+    count = Count(es['sessions']['id'], parent_entity=es['customers'])
+    df = PandasBackend(es, [count]).calculate_all_features(
+        instance_ids=['a', 'b'], time_last=None)
+    assert df[count.get_name()].tolist() == [0, 0]
@@ -0,0 +1,132 @@
+import os
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from ..testing_utils import make_ecommerce_entityset
+
+from featuretools import EntitySet, Timedelta
+from featuretools.computational_backends.pandas_backend import PandasBackend
+from featuretools.entityset.column_store import ColumnStore
+from featuretools.primitives import Count, DirectFeature, Mean
+
+
+@pytest.fixture
+def stored_entityset(tmpdir):
+    es = make_ecommerce_entityset()
+    es.store_columns(str(tmpdir))
+    return es
+
+
+def test_read_rows_and_columns(tmpdir):
+    df = pd.DataFrame({'id': ['a', 'b', 'c'],
+                       'ints': [1, 2, 3],
+                       'strings': ['x', None, 'x'],
+                       'categories': pd.Categorical(['u', 'v', None]),
+                       'times': pd.date_range('2017-01-01', periods=3)})
+    store = ColumnStore.write(df, str(tmpdir), index='id')
+    assert len(store) == 3
+
+    read = store.read()
+    assert read.index.tolist() == ['a', 'b', 'c']
+    assert read['ints'].dtype == np.int64
+    assert read['strings'].tolist()[::2] == ['x', 'x']
+    assert pd.isnull(read['strings'][1])
+    assert read['categories'].dtype.name == 'category'
+    assert read['times'].tolist() == df['times'].tolist()
+
+    read = store.read(columns=['ints', 'strings'], rows=np.array([2, 0]))
+    assert list(read.columns) == ['ints', 'strings']
+    assert read.index.tolist() == ['c', 'a']
+    assert read['ints'].tolist() == [3, 1]
+    assert store.read(rows=slice(1, 2))['ints'].tolist() == [2]
+
+
+def test_queries_match_in_memory(stored_entityset):
+    es = make_ecommerce_entityset()
+    queries = [
+        dict(entity_id='log', instance_vals=[0, 1, 2, 3, 4]),
+        dict(entity_id='log', instance_vals=[0, 1], variable_id='session_id',
+             time_last=datetime(2011, 4, 9, 10, 30, 24)),
+        dict(entity_id='log', instance_vals=[1, 0], variable_id='session_id',
+             columns=['value']),
+        dict(entity_id='log', instance_vals=[2, 1, 3], return_sorted=True),
+        dict(entity_id='log', instance_vals=None,
+             time_last=datetime(2011, 4, 9, 10, 40, 0),
+             training_window=Timedelta(2, 'minutes')),
+        dict(entity_id='customers', instance_vals=[0, 2],
+             time_last=datetime(2011, 4, 9)),
+        dict(entity_id='products', instance_vals=['coke zero', 'car'],
+             variable_id='id'),
+    ]
+    for query in queries:
+        entity_id = query.pop('entity_id')
+        expected = es[entity_id].query_by_values(**query)
+        result = stored_entityset[entity_id].query_by_values(**query)
+        if query.get('columns') is not None:
+            assert list(result.columns) == query['columns']
+        pd.testing.assert_frame_equal(result[expected.columns], expected)
+
+    for entity in stored_entityset.entities:
+        assert entity.column_store is not None
+
+
+def test_calculate_features_on_stored_entities(stored_entityset):
+    es = make_ecommerce_entityset()
+    for entityset in [es, stored_entityset]:
+        features = [Count(entityset['log']['id'], entityset['sessions']),
+                    Mean(entityset['log']['value'], entityset['sessions']),
+                    DirectFeature(entityset['customers']['age'],
+                                  entityset['sessions'])]
+        backend = PandasBackend(entityset, features)
+        df = backend.calculate_all_features(
+            instance_ids=range(6), time_last=datetime(2011, 4, 9, 10, 40, 0))
+        if entityset is es:
+            expected = df
+    pd.testing.assert_frame_equal(df, expected)
+    assert stored_entityset['log'].column_store is not None
+
+
+def test_load_columns(stored_entityset):
+    es = make_ecommerce_entityset()
+    log = stored_entityset['log']
+    assert log.num_instances == es['log'].num_instances
+    df = log.df
+    assert log.column_store is None
+    pd.testing.assert_frame_equal(df, es['log'].df)
+
+
+def test_column_metadata_without_loading(stored_entityset):
+    es = make_ecommerce_entityset()
+    for entity in stored_entityset.entities:
+        in_memory = es[entity.id]
+        for column in in_memory.df.columns:
+            assert entity.get_column_type(column) == \
+                in_memory.get_column_type(column)
+        assert list(stored_entityset.get_column_names(entity.id)) == \
+            list(in_memory.df.columns)
+    log = stored_entityset['log']
+    pd.testing.assert_series_equal(log.get_column_data('value'),
+                                   es['log'].get_column_data('value'))
+    assert log.get_column_max('value') == es['log'].get_column_max('value')
+    pd.testing.assert_frame_equal(log.head(3), es['log'].head(3))
+    for entity in stored_entityset.entities:
+        assert entity.column_store is not None
+
+
+def test_pickle_stored_entities(stored_entityset, tmpdir, monkeypatch):
+    from featuretools.entityset import serialization
+
+    # write the stored entities in several chunks
+    monkeypatch.setattr(serialization, '_CSV_CHUNK_SIZE', 4)
+    path = os.path.join(str(tmpdir), 'pickled')
+    stored_entityset.to_pickle(path)
+    for entity in stored_entityset.entities:
+        assert entity.column_store is not None
+
+    new_es = EntitySet.read_pickle(path)
+    es = make_ecommerce_entityset()
+    for entity in es.entities:
+        pd.testing.assert_frame_equal(new_es[entity.id].df, entity.df)
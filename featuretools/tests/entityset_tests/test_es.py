@@ -1,3 +1,5 @@
+import numpy as np
+import pandas as pd
 import pytest
 
 from ..testing_utils import make_ecommerce_entityset
@@ -153,6 +155,30 @@ def test_gzip_glob_entityset(es, gzip_glob_es):
     assert df_1.equals(df_2)
 
 
+def test_csv_list_entityset(tmpdir):
+    files = [('id,code,amount,count\n0,1,1.5,1\n1,2,2,2\n', 'part-0.csv'),
+             ('id,code,amount,count\n2,a,,3\n3,4,3,4\n', 'part-1.csv'),
+             ('id,code,amount,count\n4,5,4.5,4.5\n', 'part-2.csv')]
+    paths = []
+    for contents, filename in files:
+        path = tmpdir.join(filename)
+        path.write(contents)
+        paths.append(str(path))
+
+    for csv_path in [paths, os.path.join(str(tmpdir), 'part-*.csv')]:
+        new_es = EntitySet(id='test')
+        new_es.entity_from_csv('test_entity', csv_path, index='id', n_jobs=2)
+        df = new_es['test_entity'].df
+        assert df['id'].tolist() == range(5)
+        assert df['amount'].dtype == float
+        # the second file does not fit the dtypes of the first, so the codes
+        # of every file are parsed as strings
+        assert df['code'].tolist() == ['1', '2', 'a', '4', '5']
+        # the last file has a decimal count, so every count is a float
+        assert df['count'].dtype == float
+        assert df['count'].tolist() == [1, 2, 3, 4, 4.5]
+
+
 def test_serialization(es):
     dirname = os.path.dirname(integration_data.__file__)
     path = os.path.join(dirname, 'test_entityset.p')
@@ -162,3 +188,67 @@ def test_serialization(es):
     new_es = EntitySet.read_pickle(path)
     assert es.__eq__(new_es, deep=True)
     shutil.rmtree(path)
+
+
+def test_serialization_of_old_indexes(es, tmpdir):
+    path = os.path.join(str(tmpdir), 'test_entityset')
+    es.to_pickle(path)
+    # older versions saved each index as a dictionary of the positions of
+    # every value
+    for entity in es.entities:
+        indexed_by = {}
+        for variable_id in entity.indexed_by:
+            groups = entity.df.groupby(entity.df[variable_id]).groups
+            indexed_by[variable_id] = {value: np.array(rows)
+                                       for value, rows in groups.items()}
+        pd.to_pickle(indexed_by, os.path.join(path, entity.id,
+                                              'indexed_by.p'))
+
+    new_es = EntitySet.read_pickle(path)
+    assert all(index is None for index in new_es['log'].indexed_by.values())
+    df = new_es.query_entity_by_values('log', [0, 1], variable_id='session_id')
+    assert df.equals(es.query_entity_by_values('log', [0, 1],
+                                               variable_id='session_id'))
+
+
+def test_columnar_serialization(es, tmpdir):
+    path = os.path.join(str(tmpdir), 'test_entityset')
+    es.to_columnar(path)
+    new_es = EntitySet.read_columnar(path)
+    assert es.__eq__(new_es, deep=True)
+    for entity in es.entities:
+        assert entity.df.dtypes.equals(new_es[entity.id].df.dtypes)
+        assert entity.df.equals(new_es[entity.id].df)
+
+    new_es = EntitySet.read_columnar(path, memory_map=True)
+    assert new_es['log'].column_store is not None
+    df = new_es.query_entity_by_values('log', [0, 1], variable_id='session_id')
+    assert df.equals(es.query_entity_by_values('log', [0, 1],
+                                               variable_id='session_id'))
+
+
+def test_columnar_serialization_partial(es, tmpdir):
+    path = os.path.join(str(tmpdir), 'test_entityset')
+    es.to_columnar(path)
+    new_es = EntitySet.read_columnar(path, entity_ids=['sessions', 'log'],
+                                     columns={'log': ['value']})
+    assert sorted(e.id for e in new_es.entities) == ['log', 'sessions']
+    assert len(new_es.relationships) == 1
+    log_columns = ['id', 'session_id', 'datetime', 'value']
+    assert sorted(new_es['log'].df.columns) == sorted(log_columns)
+    assert sorted(v.id for v in new_es['log'].variables) == sorted(log_columns)
+    assert new_es['sessions'].df.equals(es['sessions'].df)
+
+
+def test_columnar_serialization_failure_keeps_data(es, tmpdir, monkeypatch):
+    from featuretools.entityset import serialization
+
+    def fail(*args, **kwargs):
+        raise IOError("disk full")
+
+    dfs = {entity.id: entity.df.copy() for entity in es.entities}
+    monkeypatch.setattr(serialization, 'pd_to_pickle', fail)
+    with pytest.raises(IOError):
+        es.to_columnar(os.path.join(str(tmpdir), 'test_entityset'))
+    for entity in es.entities:
+        assert entity.df.equals(dfs[entity.id])
@@ -50,6 +50,23 @@ class TestQueryFuncs(object):
         assert df['id'].get_values().tolist() == range(10)
         assert df['value'].get_values().tolist() == true_values
 
+    def test_query_all_with_time(self, entityset):
+        log = entityset['log']
+        assert log.time_index_is_sorted
+        time_last = datetime(2011, 4, 10, 10, 40, 1)
+        df = log.query_by_values(None, time_last=time_last,
+                                 training_window='1 day')
+        assert df['id'].get_values().tolist() == [10, 11]
+
+    def test_query_with_time_unsorted(self, entityset):
+        log = entityset['log']
+        log.update_data(log.df.iloc[::-1])
+        assert not log.time_index_is_sorted
+        df = entityset.query_entity_by_values(
+            entity_id='log', instance_vals=[0, 1, 2], variable_id='session_id',
+            time_last=datetime(2011, 4, 9, 10, 50, 0))
+        assert sorted(df['id'].get_values().tolist()) == range(10)
+
     def test_query_by_indexed_variable(self, entityset):
         df = entityset.query_entity_by_values(
             entity_id='log', instance_vals=['taco clock'],
@@ -280,6 +297,49 @@ class TestVariableHandling(object):
         # assert e['boolean_with_nan'].num_true == 1
         # assert e['boolean_with_nan'].num_false == 1
 
+    def test_statistics_match_columns(self):
+        n = 40
+        df = pd.DataFrame({'id': range(n),
+                           'floats': np.linspace(0, 1, n),
+                           'more_floats': np.linspace(1, 3, n),
+                           'ints': np.arange(n) % 7,
+                           'labels': ['0'] * 15 + [str(i) for i in range(1, 26)],
+                           'text': ['word ' * 20 + str(i) for i in range(n)]})
+        vtypes = {'ints': variable_types.Categorical}
+        entityset = EntitySet(id='test')
+        entityset.entity_from_dataframe('test_entity', df, 'id',
+                                        variable_types=vtypes)
+        e = entityset['test_entity']
+        assert isinstance(e['text'], variable_types.Text)
+        assert isinstance(e['labels'], variable_types.Categorical)
+        for column in ['floats', 'more_floats']:
+            for stat in ['count', 'mean', 'max', 'min', 'std']:
+                assert getattr(e[column], stat) == getattr(df[column], stat)()
+        for column in ['ints', 'labels']:
+            assert e[column].count == n
+            assert e[column].nunique == df[column].nunique()
+
+        # more interesting values are needed than were counted with the
+        # statistics
+        e.add_interesting_values(max_values=30)
+        assert sorted(e['ints'].interesting_values) == range(7)
+        assert e['labels'].interesting_values == ['0']
+
+    def test_sample_counts_own_values(self):
+        df = pd.DataFrame({'id': range(40), 'ints': np.arange(40) % 7})
+        vtypes = {'ints': variable_types.Categorical}
+        entityset = EntitySet(id='test')
+        entityset.entity_from_dataframe('test_entity', df, 'id',
+                                        variable_types=vtypes)
+        e = entityset['test_entity']
+        value_counts = e._value_counts
+
+        sample = entityset.get_sample(3)['test_entity']
+        sample.add_interesting_values()
+        assert sorted(sample['ints'].interesting_values) == \
+            sorted(sample.df['ints'].unique())
+        assert e._value_counts is value_counts
+
     def test_column_funcs(self, entityset):
         # Note: to convert the time column directly either the variable type
         # or convert_date_columns must be specifie
@@ -414,6 +474,88 @@ class TestVariableHandling(object):
         times = es["t"].df.transaction_time.tolist()
         assert times == transactions_df.transaction_time.tolist()
 
+    def test_sorted_ties_by_index(self):
+        transactions_df = pd.DataFrame({"id": [3, 1, 2, 4],
+                                        "transaction_time": [datetime(2012, 4, 8),
+                                                             datetime(2013, 4, 8),
+                                                             datetime(2013, 4, 8),
+                                                             datetime(2014, 4, 8)]})
+        es = EntitySet(id='test')
+        es.entity_from_dataframe('t', transactions_df, index='id',
+                                 time_index="transaction_time")
+        assert es['t'].df['id'].tolist() == [3, 1, 2, 4]
+
+        transactions_df['id'] = [3, 2, 1, 4]
+        es.entity_from_dataframe('u', transactions_df, index='id',
+                                 time_index="transaction_time")
+        assert es['u'].df['id'].tolist() == [3, 1, 2, 4]
+
+    def test_without_copy(self):
+        transactions_df = pd.DataFrame({"id": [1, 2, 3],
+                                        "amount": [10.5, 20.0, 3.25],
+                                        "transaction_time": pd.date_range(start="10:00", periods=3, freq="10s")})
+        expected = EntitySet(id='test').entity_from_dataframe(
+            't', transactions_df, index='id', time_index='transaction_time')
+
+        amounts = transactions_df['amount'].values
+        es = EntitySet(id='test')
+        es.entity_from_dataframe('t', transactions_df, index='id',
+                                 time_index='transaction_time', copy=False)
+        df = es['t'].df
+        assert df is transactions_df
+        assert np.shares_memory(df['amount'].values, amounts)
+        assert np.shares_memory(df.index.values, df['id'].values)
+        pd.testing.assert_frame_equal(df, expected['t'].df)
+
+    def test_without_copy_unsorted(self):
+        transactions_df = pd.DataFrame({"id": [3, 1, 2],
+                                        "amount": [10.5, 20.0, 3.25],
+                                        "transaction_time": pd.date_range(start="10:00", periods=3, freq="10s")[::-1]})
+        expected = EntitySet(id='test').entity_from_dataframe(
+            't', transactions_df, index='id', time_index='transaction_time')
+
+        es = EntitySet(id='test')
+        es.entity_from_dataframe('t', transactions_df, index='id',
+                                 time_index='transaction_time', copy=False)
+        df = es['t'].df
+        assert df['id'].tolist() == [2, 1, 3]
+        # the index is built over the sorted index column
+        assert np.shares_memory(df.index.values, df['id'].values)
+        pd.testing.assert_frame_equal(df, expected['t'].df)
+
+    def test_optimize_memory(self):
+        df = pd.DataFrame({'id': [0, 1, 2, 3],
+                           'small_ints': [1, -2, 3, 4],
+                           'large_ints': [0, 1, 2, 2 ** 40],
+                           'halves': [0.5, 1.5, np.nan, 2.5],
+                           'thirds': [1. / 3, 2. / 3, 1., 0.],
+                           'flags': np.array([True, False, True, True],
+                                             dtype=object),
+                           'labels': ['a', 'b', 'a', 'a'],
+                           'text': ['a', 'b', 'c', 'd']})
+        es = EntitySet(id='test')
+        es.entity_from_dataframe('test_entity', df, index='id',
+                                 variable_types={'flags': variable_types.Boolean,
+                                                 'labels': variable_types.Categorical,
+                                                 'text': variable_types.Text})
+        report = es.optimize_memory()
+        dtypes = es['test_entity'].df.dtypes
+        assert dtypes['id'] == np.int64
+        assert dtypes['small_ints'] == np.int16
+        assert dtypes['large_ints'] == np.int64
+        assert dtypes['halves'] == np.float32
+        assert dtypes['thirds'] == np.float64
+        assert dtypes['flags'] == np.bool
+        assert dtypes['labels'].name == 'category'
+        assert dtypes['text'] == np.object
+
+        row = report.loc[('test_entity', 'small_ints')]
+        assert row['dtype_before'] == 'int64'
+        assert row['dtype_after'] == 'int16'
+        assert row['memory_before'] == 32
+        assert row['memory_after'] == 8
+        assert (report['memory_after'] <= report['memory_before']).all()
+
     def test_concat_entitysets(self, entityset):
         df = pd.DataFrame({'id': [0, 1, 2], 'category': ['a', 'b', 'a']})
         vtypes = {'id': variable_types.Categorical,
@@ -457,6 +599,35 @@ class TestVariableHandling(object):
                 for x, y in zip(df[column], df_3[column]):
                     assert ((pd.isnull(x) and pd.isnull(y)) or (x == y))
 
+    def test_append_rows(self, entityset):
+        log = entityset['log']
+        df = log.df.copy()
+        statistics = {v.id: dict(v._statistics) for v in log.variables}
+        log.update_data(df.iloc[[0, 1, 2, 5, 6, 9, 10, 14]])
+        entityset.build_indexes()
+
+        # rows which go in between existing rows, and rows which go at the end
+        entityset.append('log', df.iloc[[8, 3, 4, 7]].reset_index(drop=True))
+        entityset.append('log', df.iloc[[16, 11, 15, 12, 13]])
+        pd.testing.assert_frame_equal(log.df, df)
+        assert log.time_index_is_sorted
+
+        for variable in log.variables:
+            for stat, value in statistics[variable.id].items():
+                if isinstance(value, float):
+                    assert np.isclose(variable._statistics[stat], value)
+                else:
+                    assert variable._statistics[stat] == value
+
+        result = entityset.query_entity_by_values('log', [1, 3],
+                                                  variable_id='session_id')
+        expected = df['id'][df['session_id'].isin([1, 3])]
+        assert result['id'].tolist() == expected.tolist()
+
+    def test_append_existing_rows_raises(self, entityset):
+        with pytest.raises(AssertionError):
+            entityset.append('customers', entityset['customers'].df.iloc[:1])
+
 
 class TestRelatedInstances(object):
 
@@ -511,6 +682,13 @@ class TestRelatedInstances(object):
         for val in frame['sessions.customer_id']:
             assert val == 1
 
+        frame = entityset._related_instances(
+            start_entity_id='customers', final_entity_id='log',
+            instance_ids=[0, 1, 2], add_link=True)
+        sessions = entityset['sessions'].df
+        customer_ids = sessions['customer_id'][frame['session_id']].values
+        assert frame['sessions.customer_id'].tolist() == customer_ids.tolist()
+
     def test_get_pandas_slice(self, entityset):
         filter_eids = ['products', 'regions', 'customers']
         result = entityset.get_pandas_data_slice(filter_entity_ids=filter_eids,
@@ -584,6 +762,18 @@ class TestRelatedInstances(object):
             nulls = customers_df.iloc[all_instances][col].isnull() == [False, True, True]
             assert nulls.all(), "Some instance has data it shouldn't for column %s" % col
 
+        # the entity itself is not modified
+        assert not entityset['customers'].df['cancel_date'].isnull().any()
+
+    def test_query_without_copy(self, entityset):
+        customers = entityset['customers']
+        end = datetime(2011, 10, 1)
+        df = customers.query_by_values(None, time_last=end, copy=False)
+        assert df['cancel_reason'][[0, 1, 2]].isnull().tolist() == [False, True, True]
+        df['new_column'] = 1
+        assert 'new_column' not in customers.df.columns
+        assert not customers.df['cancel_reason'].isnull().any()
+
     def test_add_link_vars(self, entityset):
         eframes = {e_id: entityset.get_dataframe(e_id)
                    for e_id in ["log", "sessions", "customers", "regions"]}
@@ -594,6 +784,38 @@ class TestRelatedInstances(object):
 
         assert 'sessions.customer_id' in eframes['log'].columns
         assert 'sessions.customers.region_id' in eframes['log'].columns
+        assert 'sessions.customer_id' not in entityset['log'].df.columns
+
+        log = eframes['log']
+        sessions = entityset['sessions'].df
+        customers = entityset['customers'].df
+        customer_ids = sessions['customer_id'][log['session_id']].values
+        region_ids = customers['region_id'][customer_ids].values
+        assert log['sessions.customer_id'].tolist() == customer_ids.tolist()
+        assert log['sessions.customers.region_id'].tolist() == region_ids.tolist()
+
+    def test_sample_entityset(self, entityset):
+        sampled = entityset.sample_entityset('sessions', 2, seed=0)
+        again = entityset.sample_entityset('sessions', 2, seed=0)
+        for entity in sampled.entities:
+            pd.testing.assert_frame_equal(entity.df, again[entity.id].df)
+
+        session_ids = sampled['sessions'].df['id']
+        assert len(session_ids) == 2
+        log = sampled['log'].df
+        expected_log = entityset['log'].df
+        expected_log = expected_log[expected_log['session_id'].isin(session_ids)]
+        assert sorted(log['id']) == sorted(expected_log['id'])
+
+        for r in sampled.relationships:
+            child_values = r.child_entity.df[r.child_variable.id].dropna()
+            assert child_values.isin(r.parent_entity.df.index).all()
+
+        for entity in entityset.entities:
+            sampled_entity = sampled[entity.id]
+            assert sampled_entity.time_index == entity.time_index
+            for variable in entity.variables:
+                assert type(sampled_entity[variable.id]) == type(variable)
 
 
 class TestNormalizeEntity(object):
@@ -659,6 +881,25 @@ class TestNormalizeEntity(object):
         assert 'value_time' in entityset['values'].df.columns
         assert len(entityset['values'].df.columns) == 3
 
+    def test_normalize_entity_reduces_like_drop_duplicates(self, entityset):
+        log_df = entityset['log'].df.copy()
+        entityset.normalize_entity('log', 'values', 'value',
+                                   make_time_index=True,
+                                   time_index_reduce='last',
+                                   copy_variables=['comments'])
+
+        expected = log_df.drop_duplicates('value', keep='last')
+        values_df = entityset['values'].df
+        assert len(values_df) == len(expected)
+        assert values_df['value'].isnull().sum() == 1
+        expected = expected.set_index('value', drop=False)
+        values_df = values_df.set_index('value', drop=False)
+        assert (values_df['last_log_time'] ==
+                expected['datetime'][values_df.index]).all()
+        assert (values_df['comments'] ==
+                expected['comments'][values_df.index]).all()
+        pd.testing.assert_frame_equal(entityset['log'].df, log_df)
+
 
 def test_head_of_entity(entityset):
 
@@ -0,0 +1,118 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from ..testing_utils import make_ecommerce_entityset
+
+from featuretools.entityset.variable_index import VariableIndex
+
+
+@pytest.fixture(scope='module')
+def es():
+    return make_ecommerce_entityset()
+
+
+def test_index_layout():
+    index = VariableIndex.from_values(np.array(['b', 'a', 'b', None, 'c', 'a']))
+    assert len(index) == 3
+    assert 'a' in index
+    assert None not in index
+    assert index['a'].tolist() == [1, 5]
+    assert index['b'].tolist() == [0, 2]
+    assert index['c'].tolist() == [4]
+    assert index.offsets.tolist() == [0, 2, 4, 5]
+
+
+def test_get_positions_keeps_value_order():
+    index = VariableIndex.from_values(pd.Series([3, 1, 3, 2, 1]).values)
+    assert index.get_positions([1, 3]).tolist() == [1, 4, 0, 2]
+    assert index.get_positions([3, 1]).tolist() == [0, 2, 1, 4]
+
+
+def test_get_positions_missing_values():
+    index = VariableIndex.from_values(np.array([0, 0, 1]))
+    assert index.get_positions([5, 1]).tolist() == [2]
+    assert index.get_positions([5]).tolist() == []
+    assert index.get_positions([]).tolist() == []
+
+
+def test_extend_matches_rebuild():
+    values = np.array(['b', 'a', None, 'b', 'c', 'a', 'd', None, 'b'])
+    index = VariableIndex.from_values(values[:4])
+    index.extend(values[4:], start=4)
+    rebuilt = VariableIndex.from_values(values)
+    for value in ['a', 'b', 'c', 'd']:
+        assert index[value].tolist() == rebuilt[value].tolist()
+    assert index.get_positions(['d', 'b', 'a']).tolist() == \
+        rebuilt.get_positions(['d', 'b', 'a']).tolist()
+
+
+def test_insert_matches_rebuild():
+    values = np.array(['b', 'a', None, 'b', 'c', 'a', 'd', None, 'b'])
+    inserted = [1, 4, 5, 8]
+    kept = [0, 2, 3, 6, 7]
+    index = VariableIndex.from_values(values[kept])
+    index.insert(values[inserted], np.array(inserted), np.array(kept))
+    rebuilt = VariableIndex.from_values(values)
+    assert len(index) == len(rebuilt)
+    for value in ['a', 'b', 'c', 'd']:
+        assert index[value].tolist() == rebuilt[value].tolist()
+
+
+def test_indexes_built_lazily():
+    es = make_ecommerce_entityset()
+    assert es['log'].indexed_by['session_id'] is None
+    es.query_entity_by_values('log', [0], variable_id='session_id')
+    assert isinstance(es['log'].indexed_by['session_id'], VariableIndex)
+    assert es['log'].indexed_by['product_id'] is None
+
+
+def test_build_indexes():
+    es = make_ecommerce_entityset()
+    es.build_indexes(n_jobs=2)
+    for entity in es.entities:
+        assert entity.get_unbuilt_indexes() == []
+    assert isinstance(es['log'].indexed_by['product_id'], VariableIndex)
+
+
+def test_update_data_resets_indexes():
+    es = make_ecommerce_entityset()
+    es.build_indexes()
+    log = es['log']
+    log.update_data(log.df.iloc[::-1])
+    assert log.indexed_by['session_id'] is None
+    df = es.query_entity_by_values('log', [1], variable_id='session_id')
+    assert sorted(df['id'].tolist()) == [5, 6, 7, 8]
+
+
+def test_update_data_extends_indexes():
+    es = make_ecommerce_entityset()
+    es.build_indexes()
+    log = es['log']
+    df = log.df
+    log.update_data(df.iloc[:10])
+    log.build_indexes()
+    log.update_data(df, num_unchanged_rows=10)
+    index = log.indexed_by['session_id']
+    assert index is not None
+    rebuilt = VariableIndex.from_values(df['session_id'].values)
+    assert index.get_positions(range(6)).tolist() == \
+        rebuilt.get_positions(range(6)).tolist()
+
+
+def test_entity_indexed_by_relationship(es):
+    index = es['log'].get_variable_index('session_id')
+    assert isinstance(index, VariableIndex)
+    positions = index.get_positions([1, 0])
+    ids = es['log'].df['id'].values[positions]
+    assert ids.tolist() == [5, 6, 7, 8, 0, 1, 2, 3, 4]
+
+
+def test_index_categorical_values():
+    values = pd.Categorical(['b', 'a', None, 'b'], categories=['a', 'b', 'c'])
+    index = VariableIndex.from_values(values)
+    assert index['b'].tolist() == [0, 3]
+    assert index['c'].tolist() == []
+    assert index.get_positions(pd.Categorical(['b', None, 'a'])).tolist() == [0, 3, 1]
+    index.extend(pd.Categorical(['c', 'a']), start=4)
+    assert index.get_positions(['a', 'c']).tolist() == [1, 5, 4]
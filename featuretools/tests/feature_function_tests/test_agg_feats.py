@@ -1,19 +1,25 @@
 from datetime import datetime
 
+import numpy as np
 import pandas as pd
 import pytest
 
 from ..testing_utils import feature_with_name, make_ecommerce_entityset
 
-from featuretools import calculate_feature_matrix, dfs
+from featuretools import EntitySet, Relationship, calculate_feature_matrix, dfs
 from featuretools.primitives import (
     AggregationPrimitive,
     Count,
     Feature,
+    Last,
     Mean,
+    Median,
     NumTrue,
+    Skew,
+    Std,
     Sum,
     TimeSinceLast,
+    Trend,
     get_aggregation_primitives,
     make_agg_primitive
 )
@@ -265,6 +271,51 @@ def test_time_since_last(es):
     assert all(fm[f.get_name()].round().values == correct)
 
 
+def test_trend(es):
+    f = Trend([es['log']['value'], es['log']['datetime']], es['sessions'])
+    fm = calculate_feature_matrix([f], instance_ids=range(6))
+
+    # sessions starting on the minute give slopes in value per minute
+    correct = [50, 20 / 3., np.nan, np.nan, 140, np.nan]
+    np.testing.assert_allclose(fm[f.get_name()].values, correct)
+
+
+def test_std_and_skew_nans():
+    parents = pd.DataFrame({'id': [0, 1, 2, 3, 4]})
+    children = pd.DataFrame({'id': range(12),
+                             'parent_id': [0, 0, 0, 0, 1, 1, 1, 2, 3, 4, 4, 4],
+                             'value': [1, 2, 10, np.nan, .1, .1, .1, 4, np.nan,
+                                       1, 2, 10]})
+    es = EntitySet('moments')
+    es.entity_from_dataframe('parents', parents, index='id')
+    es.entity_from_dataframe('children', children, index='id')
+    es.add_relationship(Relationship(es['parents']['id'],
+                                     es['children']['parent_id']))
+
+    std = Std(es['children']['value'], es['parents'])
+    skew = Skew(es['children']['value'], es['parents'])
+    fm = calculate_feature_matrix([std, skew], instance_ids=range(5))
+
+    # std ignores nans and uses ddof=0, skew is nan if there are any nans,
+    # and both are exactly 0 when all the values are the same
+    np.testing.assert_allclose(fm[std.get_name()].values,
+                               [4.02768199, 0, 0, np.nan, 4.02768199])
+    np.testing.assert_allclose(fm[skew.get_name()].values,
+                               [np.nan, 0, 0, np.nan, 0.67455548])
+    assert (fm.loc[[1, 2]] == 0).all().all()
+
+
+def test_median_and_last(es):
+    median = Median(es['log']['value'], es['sessions'])
+    last = Last(es['log']['value'], es['sessions'])
+    fm = calculate_feature_matrix([median, last], instance_ids=range(6))
+
+    np.testing.assert_array_equal(fm[median.get_name()].values,
+                                  [10, 1.5, 0, 2.5, 7, np.nan])
+    np.testing.assert_array_equal(fm[last.get_name()].values,
+                                  [20, 3, 0, 5, 14, np.nan])
+
+
 def test_time_since_last_custom(es):
     def time_since_last(values, time=None):
         time_since = time - values.iloc[0]
@@ -351,6 +402,46 @@ def test_custom_primitive_multiple_inputs(es):
         assert ((pd.isnull(x) and pd.isnull(y)) or (x == y))
 
 
+def test_custom_primitive_grouped_function(es):
+    def total(values):
+        raise AssertionError("the grouped function should be used instead")
+
+    def grouped_total(codes, values):
+        return np.bincount(codes, weights=values.fillna(0))
+
+    def time_since_first(values, time):
+        return (time - values.min()).total_seconds()
+
+    def grouped_time_since_first(codes, values, time):
+        first = pd.Series(values.values).groupby(codes).min()
+        return (time - first).dt.total_seconds()
+
+    Total = make_agg_primitive(total, [Numeric], Numeric,
+                               grouped_function=grouped_total)
+    TimeSinceFirst = make_agg_primitive(time_since_first,
+                                        [DatetimeTimeIndex], Numeric,
+                                        uses_calc_time=True)
+    GroupedTimeSinceFirst = make_agg_primitive(
+        time_since_first, [DatetimeTimeIndex], Numeric,
+        name="grouped_time_since_first", uses_calc_time=True,
+        grouped_function=grouped_time_since_first)
+
+    where = Feature(es['log']['priority_level']) == 0
+    pairs = [(Total(es['log']['value'], es['sessions']),
+              Sum(es['log']['value'], es['sessions'])),
+             (Total(es['log']['value'], es['sessions'], where=where),
+              Sum(es['log']['value'], es['sessions'], where=where)),
+             (GroupedTimeSinceFirst(es['log']['datetime'], es['sessions']),
+              TimeSinceFirst(es['log']['datetime'], es['sessions']))]
+    features = [f for pair in pairs for f in pair]
+    fm = calculate_feature_matrix(features, instance_ids=range(6),
+                                  cutoff_time=datetime(2015, 6, 8))
+
+    for grouped, expected in pairs:
+        np.testing.assert_array_equal(fm[grouped.get_name()].values,
+                                      fm[expected.get_name()].values)
+
+
 def test_makes_numtrue(es):
     dfs = DeepFeatureSynthesis(target_entity_id='sessions',
                                entityset=es,
@@ -4,7 +4,7 @@ import pytest
 
 from ..testing_utils import make_ecommerce_entityset
 
-from featuretools import Timedelta
+from featuretools import EntitySet, Timedelta
 from featuretools.computational_backends import PandasBackend
 from featuretools.primitives import (
     Add,
@@ -30,16 +30,24 @@ from featuretools.primitives import (
     IsNull,
     LessThan,
     LessThanEqualTo,
+    Minute,
     Mod,
     Mode,
+    Month,
     Multiply,
     Negate,
     Not,
     NotEquals,
     Or,
     Percentile,
+    Second,
     Subtract,
     Sum,
+    TimeSincePrevious,
+    Week,
+    Weekday,
+    Weekend,
+    Year,
     get_transform_primitives,
     make_trans_primitive
 )
@@ -67,6 +75,29 @@ def test_make_trans_feat(es):
     assert v == 10
 
 
+def test_calendar_units():
+    datetimes = pd.Series(pd.to_datetime(['2016-01-01 23:59:58', '1969-12-31',
+                                          None, '2020-02-29 12:30:01',
+                                          '2018-12-31 06:00:00']))
+    df = pd.DataFrame({'id': range(5), 'datetime': datetimes})
+    es = EntitySet('calendar')
+    es.entity_from_dataframe('events', df, index='id')
+
+    units = [Day, Hour, Minute, Month, Second, Week, Weekday, Year]
+    features = [unit(es['events']['datetime']) for unit in units]
+    weekend = Weekend(es['events']['datetime'])
+    pandas_backend = PandasBackend(es, features + [weekend])
+    df = pandas_backend.calculate_all_features(instance_ids=range(5),
+                                               time_last=None)
+
+    index = pd.DatetimeIndex(datetimes)
+    for f in features:
+        np.testing.assert_array_equal(df[f.get_name()].values,
+                                      getattr(index, f.name).values)
+    assert df[weekend.get_name()].tolist() == [False, False, False, True,
+                                               False]
+
+
 def test_diff(es):
     value = IdentityFeature(es['log']['value'])
     customer_id_feat = \
@@ -107,6 +138,19 @@ def test_diff_single_value(es):
     assert df[diff.get_name()].dropna().shape[0] == 0
 
 
+def test_time_since_previous(es):
+    time_since_previous = TimeSincePrevious(es['log']['datetime'],
+                                            es['log']['session_id'])
+    pandas_backend = PandasBackend(es, [time_since_previous])
+    df = pandas_backend.calculate_all_features(instance_ids=range(15),
+                                               time_last=None)
+
+    values = df[time_since_previous.get_name()].values
+    correct_vals = [np.nan, 6, 6, 6, 6, np.nan, 9, 9, 9,
+                    np.nan, np.nan, 1, np.nan, 3, 3]
+    np.testing.assert_array_equal(values, correct_vals)
+
+
 def test_compare_of_identity(es):
     to_test = [(Equals, [False, False, True, False]),
                (NotEquals, [True, True, False, True]),
@@ -362,6 +406,50 @@ def test_arithmetic_of_agg(es):
         assert v == test[1]
 
 
+def test_chain_of_binary_features(es):
+    age = es['customers']['age']
+    mod_zero = Mod(age, 0)
+    years = Mod(age, 10)
+    decades = Divide(Subtract(age, years), 10)
+    old = GreaterThan(decades, 2)
+    either = Or(old, Equals(age, 25))
+    features = [mod_zero, years, decades, old, either, Negate(decades)]
+
+    pandas_backend = PandasBackend(es, features)
+    df = pandas_backend.calculate_all_features(instance_ids=[0, 1, 2],
+                                               time_last=None)
+
+    assert df[mod_zero.get_name()].isnull().all()
+    assert df[years.get_name()].values.tolist() == [3, 5, 6]
+    assert df[years.get_name()].dtype == np.int64
+    assert df[decades.get_name()].values.tolist() == [3, 2, 5]
+    assert df[old.get_name()].values.tolist() == [True, False, True]
+    assert df[either.get_name()].values.tolist() == [True, True, True]
+    assert df[Negate(decades).get_name()].values.tolist() == [-3, -2, -5]
+
+
+def test_chain_of_binary_features_not_requested(es):
+    age = es['customers']['age']
+    years = Mod(age, 10)
+    decades = Divide(Subtract(age, years), 10)
+    old = Or(GreaterThan(decades, 2), Equals(age, 25))
+    mod_zero = Mod(Multiply(age, 2), 0)
+    features = [decades, old, mod_zero]
+
+    pandas_backend = PandasBackend(es, features)
+    df = pandas_backend.calculate_all_features(instance_ids=[0, 1, 2],
+                                               time_last=None)
+
+    # features only used by one other binary feature are calculated along
+    # with it
+    inlined = [years, Subtract(age, years), GreaterThan(decades, 2),
+               Equals(age, 25), Multiply(age, 2)]
+    assert pandas_backend._inlined == set(f.get_name() for f in inlined)
+    assert df[decades.get_name()].values.tolist() == [3, 2, 5]
+    assert df[old.get_name()].values.tolist() == [True, True, True]
+    assert df[mod_zero.get_name()].isnull().all()
+
+
 def test_cum_sum(es):
     log_value_feat = es['log']['value']
     cum_sum = CumSum(log_value_feat, es['log']['session_id'])
@@ -564,6 +652,23 @@ def test_cum_sum_use_previous_and_where_absolute(es):
         assert v == cvalues[i]
 
 
+def test_cum_max_use_previous_skips_nans():
+    es = make_ecommerce_entityset()
+    log_df = es['log'].df
+    log_df['value'] = log_df['value'].where(log_df['id'] != 0)
+    cum_max = CumMax(es['log']['value'], es['log']['session_id'],
+                     es['log']['datetime'],
+                     use_previous=Timedelta(40, 'seconds'))
+    features = [cum_max]
+    pandas_backend = PandasBackend(es, features)
+    df = pandas_backend.calculate_all_features(instance_ids=range(15),
+                                               time_last=None)
+    cvalues = df[cum_max.get_name()].values
+    assert np.isnan(cvalues[0])
+    cum_max_values = [5, 10, 15, 20, 0, 1, 2, 3, 0, 0, 5, 0, 7, 14]
+    assert cvalues[1:].tolist() == cum_max_values
+
+
 def test_cum_mean(es):
     log_value_feat = es['log']['value']
     cum_mean = CumMean(log_value_feat, es['log']['session_id'])